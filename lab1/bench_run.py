@@ -0,0 +1,75 @@
+import ast
+import sys
+import time
+
+from treeops import NodeVisitor, Program
+
+# treeops run on straight-line arithmetic: the per-node tree walk vs a
+# Program compiled once and run repeatedly.
+# With a third argument, also one Program over many input rows: run() per
+# row vs a single run_batch() (needs numpy).
+# Usage: python bench_run.py [n_assignments] [runs] [input_rows]
+
+
+def synthetic_source(n_assign, n_vars=100):
+    lines = [f"v{i} = {i}" for i in range(n_vars)]
+    for i in range(n_vars, n_assign):
+        lines.append(f"v{i % n_vars} = v{(i + 3) % n_vars} * 3 + {i} * v{(i + 7) % n_vars}")
+    return "\n".join(lines) + "\n"
+
+
+def batch(n_assign, n_rows, n_vars=100):
+    # Bounded float arithmetic, so int64 wrapping plays no part; v0..v9 come
+    # from the inputs and the rest of the program reads them
+    lines = [f"v{i} = v{i - 10} + {i}" for i in range(10, n_vars)]
+    for i in range(n_vars, n_assign):
+        lines.append(f"v{i % n_vars} = v{(i + 3) % n_vars} * 0.5 + 0.25 * v{(i + 7) % n_vars} + {i % 10}")
+    program = Program(ast.parse("\n".join(lines)))
+    columns = {f"v{i}": [float((row + i) % 7) for row in range(n_rows)] for i in range(10)}
+
+    start = time.perf_counter()
+    per_row = [program.run({name: values[row] for name, values in columns.items()})[0] for row in range(n_rows)]
+    loop = time.perf_counter() - start
+
+    start = time.perf_counter()
+    results = program.run_batch(columns)
+    vectorized = time.perf_counter() - start
+    assert all(abs(a - b) <= 1e-9 * abs(b) for a, b in zip(results, per_row))
+
+    print(f"{n_rows} input rows")
+    print(f"run() per row:     {loop:.3f}s")
+    print(f"run_batch():       {vectorized:.3f}s ({loop / vectorized:.0f}x)")
+
+
+def main():
+    n_assign = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    tree = ast.parse(synthetic_source(n_assign))
+
+    start = time.perf_counter()
+    for _ in range(runs):
+        walker = NodeVisitor()
+        walker.visit(tree)
+    walk = (time.perf_counter() - start) / runs
+
+    start = time.perf_counter()
+    program = Program(tree)
+    compile_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(runs):
+        result, env = program.run()
+    run = (time.perf_counter() - start) / runs
+    assert env == walker.vars
+
+    print(f"{n_assign} assignments, {runs} runs")
+    print(f"tree walk per run: {walk:.3f}s")
+    print(f"compile once:      {compile_time:.3f}s")
+    print(f"compiled per run:  {run:.3f}s ({walk / run:.0f}x)")
+
+    if len(sys.argv) > 3:
+        batch(n_assign, int(sys.argv[3]))
+
+
+if __name__ == "__main__":
+    main()
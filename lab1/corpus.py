@@ -0,0 +1,183 @@
+"""
+Near-duplicate detection across a corpus of Python files.
+
+Every file is fingerprinted once: a MinHash signature over node-label
+shingles (a node's label with its parent's label and its children's labels)
+and a digest of its whole label structure. Files with equal digests are at
+distance 0, and one file per such group goes on to LSH banding over the
+signatures. Only the candidate pairs that banding picks get an exact
+normalized tree edit distance, bounded by the threshold and computed in a
+process pool. Pairs within the threshold are grouped into clusters.
+"""
+import ast
+import hashlib
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+import ted
+from treeops import NodeVisitor
+
+# Helpers shared by the labs live in labtools/ at the top of the repo
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from labtools.files import collect_files
+
+NUM_PERM = 64
+_PRIME = (1 << 61) - 1
+
+
+def _permutations():
+    # Fixed (a, b) pairs so signatures agree across processes and runs
+    perms = []
+    for i in range(NUM_PERM):
+        digest = hashlib.blake2b(i.to_bytes(2, "little"), digest_size=16).digest()
+        a = int.from_bytes(digest[:8], "little") % (_PRIME - 1) + 1
+        b = int.from_bytes(digest[8:], "little") % _PRIME
+        perms.append((a, b))
+    return perms
+
+
+PERMUTATIONS = _permutations()
+
+
+def _parse(fname):
+    with open(fname, encoding="utf-8") as f:
+        return ast.parse(f.read(), filename=fname)
+
+
+def shingles(tree: ast.AST) -> Tuple[set, bytes]:
+    """
+    The node-label shingles of tree, plus a digest of its label structure:
+    every node's shingle text in traversal order, which pins down the tree
+    exactly, so equal digests mean a tree edit distance of 0.
+    """
+    labels = NodeVisitor.get_label
+    hashed = {}
+    out = set()
+    digest = hashlib.blake2b(digest_size=16)
+    stack = [(tree, "")]
+    while stack:
+        node, parent = stack.pop()
+        children = NodeVisitor.get_children(node)
+        label = labels(node)
+        text = f"{parent}>{label}({','.join([labels(c) for c in children])})"
+        digest.update(text.encode())
+        # The same shingle recurs many times within one file
+        value = hashed.get(text)
+        if value is None:
+            value = hashed[text] = int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), "little")
+        out.add(value)
+        stack.extend([(child, label) for child in children])
+    return out, digest.digest()
+
+
+def minhash(values: set) -> Tuple[int, ...]:
+    if not values:
+        return (_PRIME,) * NUM_PERM
+    values = list(values)
+    return tuple(min([(a * x + b) % _PRIME for x in values]) for a, b in PERMUTATIONS)
+
+
+def fingerprint(fname):
+    """(fname, label-structure digest, MinHash signature), or None if the file does not parse."""
+    try:
+        tree = _parse(fname)
+    except (SyntaxError, ValueError, UnicodeDecodeError, OSError):
+        return None
+    values, digest = shingles(tree)
+    return fname, digest, minhash(values)
+
+
+def choose_bands(similarity: float) -> Tuple[int, int]:
+    # (bands, rows) whose LSH threshold (1/b)^(1/r) sits well below the target
+    # similarity, so candidate recall stays high
+    best = (NUM_PERM, 1)
+    for rows in range(1, NUM_PERM + 1):
+        bands = NUM_PERM // rows
+        if (1 / bands) ** (1 / rows) <= 0.8 * similarity:
+            best = (bands, rows)
+    return best
+
+
+def candidate_pairs(signatures: Dict[str, tuple], bands: int, rows: int) -> set:
+    pairs = set()
+    for band in range(bands):
+        buckets: Dict[tuple, List[str]] = {}
+        for fname, sig in signatures.items():
+            buckets.setdefault(sig[band * rows:(band + 1) * rows], []).append(fname)
+        for members in buckets.values():
+            for i in range(len(members)):
+                for j in range(i + 1, len(members)):
+                    pairs.add((members[i], members[j]))
+    return pairs
+
+
+@lru_cache(maxsize=256)
+def _cached_parse(fname) -> ast.AST:
+    # Per worker process: each file is parsed once however many pairs it is in
+    return _parse(fname)
+
+
+def pair_distance(pair, max_dist: float):
+    """
+    Exact normalized distance of a candidate pair, or None if it exceeds
+    max_dist. An upper bound here would reject true clones, such as a module
+    with one function moved.
+    """
+    # Structural ids must come from one table to be comparable
+    ids = {}
+    t1, t2 = (ted.Tree(_cached_parse(f), NodeVisitor.get_children, NodeVisitor.get_label, ids) for f in pair)
+    total = len(t1) + len(t2)
+    try:
+        dist = ted.distance(t1, t2, int(max_dist * total))
+    except ted.BoundExceeded:
+        return None
+    return dist / total
+
+
+def clusters(files: List[str], pairs: Dict[tuple, float]) -> List[List[str]]:
+    # Union-find over the accepted pairs
+    parent = {f: f for f in files}
+
+    def find(f):
+        while parent[f] != f:
+            parent[f] = parent[parent[f]]
+            f = parent[f]
+        return f
+
+    for a, b in pairs:
+        parent[find(a)] = find(b)
+    groups: Dict[str, List[str]] = {}
+    for f in files:
+        groups.setdefault(find(f), []).append(f)
+    return sorted((sorted(g) for g in groups.values() if len(g) > 1), key=lambda g: (-len(g), g))
+
+
+def find_clones(patterns, max_dist: float, workers=None):
+    """Returns (number of files fingerprinted, clusters, {pair: normalized distance})."""
+    files = collect_files(patterns)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        prints = [p for p in pool.map(fingerprint, files, chunksize=16) if p is not None]
+
+        # Structurally identical modules need no distance at all
+        accepted: Dict[tuple, float] = {}
+        by_root: Dict[bytes, List[str]] = {}
+        for fname, root, _ in prints:
+            by_root.setdefault(root, []).append(fname)
+        for members in by_root.values():
+            for other in members[1:]:
+                accepted[members[0], other] = 0.0
+
+        # One representative per identical group goes through LSH
+        signatures = {fname: sig for fname, root, sig in prints if by_root[root][0] == fname}
+        bands, rows = choose_bands(1 - max_dist)
+        pairs = sorted(candidate_pairs(signatures, bands, rows))
+
+        for pair, dist in zip(pairs, pool.map(pair_distance, pairs, [max_dist] * len(pairs), chunksize=8)):
+            if dist is not None:
+                accepted[pair] = dist
+
+    fnames = [fname for fname, _, _ in prints]
+    return len(fnames), clusters(fnames, accepted), accepted
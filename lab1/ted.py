@@ -0,0 +1,328 @@
+"""
+Tree edit distance with unit costs (insert, delete and relabel each cost 1),
+the same measure zss.simple_distance computes.
+
+Trees are flattened to postorder arrays and every subtree gets a structural
+id, so identical subtrees are found by comparing ints. distance() strips the
+identical subtrees around the differences, in the ways that provably keep the
+distance unchanged, and solves what is left exactly: a child-by-child
+alignment gives an upper bound, and Zhang-Shasha only runs when that bound is
+not already tight, capped just below it. Its approximate mode returns the
+alignment's cost instead.
+"""
+from bisect import bisect_left
+from collections import Counter
+from difflib import SequenceMatcher
+from typing import Callable, Dict, List, Optional
+
+
+class Tree:
+    """Postorder view of a tree: node i's subtree is the index range lmld[i]..i."""
+
+    def __init__(self, root, get_children: Callable, get_label: Callable, ids: Dict):
+        # ids maps (label, child ids) to a structural id; share one dict
+        # between the trees being compared so equal ids mean equal subtrees
+        self.labels: List[str] = []
+        self.children: List[List[int]] = []
+        self.lmld: List[int] = []
+        self.ids: List[int] = []
+
+        stack = [[root, get_children(root), 0, []]]
+        while stack:
+            frame = stack[-1]
+            node, kids, pos, done = frame
+            if pos < len(kids):
+                frame[2] += 1
+                stack.append([kids[pos], get_children(kids[pos]), 0, []])
+                continue
+            stack.pop()
+            i = len(self.labels)
+            label = get_label(node)
+            self.labels.append(label)
+            self.children.append(done)
+            self.lmld.append(self.lmld[done[0]] if done else i)
+            self.ids.append(ids.setdefault((label, tuple(self.ids[c] for c in done)), len(ids)))
+            if stack:
+                stack[-1][3].append(i)
+
+    def __len__(self):
+        return len(self.labels)
+
+    @property
+    def root(self) -> int:
+        return len(self.labels) - 1
+
+    def size(self, i: int) -> int:
+        return i - self.lmld[i] + 1
+
+
+class BoundExceeded(Exception):
+    pass
+
+
+# Approximate mode: smallest run of identical children (in nodes) trusted as an anchor
+ANCHOR_SIZE = 32
+
+# Approximate mode: largest product of forest sizes handed to Zhang-Shasha in one piece
+ZS_BUDGET = 250_000
+
+# Label of the virtual root placed over a forest; equal on both sides
+_FOREST = object()
+
+
+def _flatten(tree: Tree, roots: List[int]):
+    # Postorder arrays for the forest under roots, plus a virtual root
+    labels, lmld = [], []
+    for r in roots:
+        base, offset = tree.lmld[r], len(labels)
+        labels.extend(tree.labels[base:r + 1])
+        lmld.extend(l - base + offset for l in tree.lmld[base:r + 1])
+    labels.append(_FOREST)
+    lmld.append(0)
+    return labels, lmld
+
+
+def _keyroots(lmld: List[int]) -> List[int]:
+    # The highest node for each leftmost leaf
+    highest = {}
+    for i, l in enumerate(lmld):
+        highest[l] = i
+    return sorted(highest.values())
+
+
+def zhang_shasha(labels1, lmld1, labels2, lmld2, cap: Optional[int] = None) -> int:
+    """
+    Exact unit-cost tree edit distance between two postorder trees. With a
+    cap, only distances up to cap are computed exactly and anything larger
+    comes back as cap + 1. An edit script of at most cap edits only maps
+    nodes whose postorder positions are at most cap apart, between forests
+    whose sizes differ by at most cap, so all other cells are skipped.
+    """
+    n, m = len(labels1), len(labels2)
+    big = n + m if cap is None else cap + 1
+    td = [[big] * m for _ in range(n)]
+    keyroots2 = _keyroots(lmld2)
+    for i in _keyroots(lmld1):
+        li = lmld1[i]
+        rows = i - li + 2
+        # Keyroots that end more than cap before this subtree starts share no band
+        start = 0 if cap is None else bisect_left(keyroots2, li - cap)
+        for j in keyroots2[start:]:
+            lj = lmld2[j]
+            cols = j - lj + 2
+            if cap is None:
+                first, last = 1, rows
+            else:
+                # Rows with any cell inside both bands; all other cells keep big
+                first = max(1, lj - li - cap + 1)
+                last = min(rows, cols + cap, j - li + cap + 2)
+                if first >= last:
+                    continue
+            fd = [[big] * cols] * rows
+            fd[0] = [min(y, big) for y in range(cols)]
+            for x in range(first, last):
+                i1 = li + x - 1
+                whole1 = lmld1[i1] == li
+                row, prev = [big] * cols, fd[x - 1]
+                row[0] = min(x, big)
+                fd[x] = row
+                td_i1 = td[i1]
+                if cap is None:
+                    lo, hi = 1, cols
+                else:
+                    lo = max(1, x - cap, i1 - lj + 1 - cap)
+                    hi = min(cols, x + cap + 1, i1 - lj + cap + 2)
+                for y in range(lo, hi):
+                    j1 = lj + y - 1
+                    if whole1 and lmld2[j1] == lj:
+                        cost = prev[y - 1] + (labels1[i1] != labels2[j1])
+                        row[y] = min(prev[y] + 1, row[y - 1] + 1, cost, big)
+                        td_i1[j1] = row[y]
+                    else:
+                        cost = fd[lmld1[i1] - li][lmld2[j1] - lj] + td_i1[j1]
+                        row[y] = min(prev[y] + 1, row[y - 1] + 1, cost, big)
+    return td[n - 1][m - 1]
+
+
+def forest_distance(t1: Tree, roots1: List[int], t2: Tree, roots2: List[int],
+                    cap: Optional[int] = None) -> int:
+    if not roots1:
+        return sum(t2.size(r) for r in roots2)
+    if not roots2:
+        return sum(t1.size(r) for r in roots1)
+    return zhang_shasha(*_flatten(t1, roots1), *_flatten(t2, roots2), cap=cap)
+
+
+def _histogram_bound(labels1, labels2) -> int:
+    # Labels only t1 has too many of must each be deleted or relabeled, those
+    # only t2 has too many of inserted or relabeled; one edit fixes at most
+    # one of each
+    diff = Counter(labels1)
+    diff.subtract(labels2)
+    surplus = sum(c for c in diff.values() if c > 0)
+    deficit = sum(-c for c in diff.values() if c < 0)
+    return max(surplus, deficit)
+
+
+def lower_bound(t1: Tree, t2: Tree) -> int:
+    return _histogram_bound(t1.labels, t2.labels)
+
+
+class _Aligner:
+    # Heuristic child-by-child alignment behind distance(approximate=True)
+    def __init__(self, t1: Tree, t2: Tree, limit: Optional[int]):
+        self.t1, self.t2 = t1, t2
+        self.limit = limit
+        self.cost = 0
+
+    def add(self, cost: int):
+        self.cost += cost
+        if self.limit is not None and self.cost > self.limit:
+            raise BoundExceeded()
+
+    def align(self, i: int, j: int):
+        t1, t2 = self.t1, self.t2
+        if t1.ids[i] == t2.ids[j]:
+            return
+        if t1.labels[i] != t2.labels[j]:
+            self.align_forests([i], [j])
+            return
+
+        # Same label: keep the roots matched and pair off identical children.
+        # Labels carry no identifiers, so small equal subtrees are common and
+        # pairing them across distant positions can cost more than it saves;
+        # only LCS matches covering at least ANCHOR_SIZE nodes split the child
+        # lists, and each gap between them is handled by _align_gap
+        c1, c2 = t1.children[i], t2.children[j]
+        ids1 = [t1.ids[c] for c in c1]
+        ids2 = [t2.ids[c] for c in c2]
+        start1 = start2 = 0
+        for a, b, size in SequenceMatcher(None, ids1, ids2, autojunk=False).get_matching_blocks():
+            if size and sum(t1.size(c) for c in c1[a:a + size]) < ANCHOR_SIZE:
+                continue
+            self._align_gap(c1[start1:a], c2[start2:b])
+            start1, start2 = a + size, b + size
+
+    def _align_gap(self, c1: List[int], c2: List[int]):
+        # Strip identical leading and trailing children, then descend
+        ids1, ids2 = self.t1.ids, self.t2.ids
+        start = 0
+        while start < len(c1) and start < len(c2) and ids1[c1[start]] == ids2[c2[start]]:
+            start += 1
+        end1, end2 = len(c1), len(c2)
+        while end1 > start and end2 > start and ids1[c1[end1 - 1]] == ids2[c2[end2 - 1]]:
+            end1 -= 1
+            end2 -= 1
+        self.align_forests(c1[start:end1], c2[start:end2])
+
+    def lines_up(self, m1: List[int], m2: List[int]) -> bool:
+        t1, t2 = self.t1, self.t2
+        return len(m1) == len(m2) and all(t1.labels[a] == t2.labels[b] for a, b in zip(m1, m2))
+
+    def align_forests(self, m1: List[int], m2: List[int]):
+        t1, t2 = self.t1, self.t2
+        if not m1 or not m2:
+            self.add(forest_distance(t1, m1, t2, m2))
+        elif self.lines_up(m1, m2):
+            # Children still line up one-to-one; descend pairwise
+            for a, b in zip(m1, m2):
+                self.align(a, b)
+        elif sum(t1.size(r) for r in m1) * sum(t2.size(r) for r in m2) <= ZS_BUDGET:
+            if self.limit is not None:
+                # Give up before a Zhang-Shasha run that cannot fit
+                labels1 = [t1.labels[k] for r in m1 for k in range(t1.lmld[r], r + 1)]
+                labels2 = [t2.labels[k] for r in m2 for k in range(t2.lmld[r], r + 1)]
+                if self.cost + _histogram_bound(labels1, labels2) > self.limit:
+                    raise BoundExceeded()
+            self.add(forest_distance(t1, m1, t2, m2))
+        else:
+            # Too big for Zhang-Shasha: pair children with equal labels in
+            # order, descend into the pairs and insert/delete the rest
+            labels1 = [t1.labels[c] for c in m1]
+            labels2 = [t2.labels[c] for c in m2]
+            paired = 0
+            for a, b, size in SequenceMatcher(None, labels1, labels2, autojunk=False).get_matching_blocks():
+                for k in range(size):
+                    self.align(m1[a + k], m2[b + k])
+                paired += sum(t1.size(c) for c in m1[a:a + size]) + sum(t2.size(c) for c in m2[b:b + size])
+            self.add(sum(t1.size(c) for c in m1) + sum(t2.size(c) for c in m2) - paired)
+
+
+def _residual(t1: Tree, t2: Tree):
+    """
+    Descends from the roots while the edit distance provably equals that of
+    a smaller pair of forests, and returns those forests. Two trees whose
+    roots have equal labels are exactly as far apart as their child forests,
+    and identical leading or trailing trees of two forests can be dropped
+    without changing their distance; when that leaves one tree on each side,
+    with equal labels again, the descent continues below them.
+    """
+    ids1, ids2 = t1.ids, t2.ids
+    m1, m2 = [t1.root], [t2.root]
+    while len(m1) == 1 and len(m2) == 1 and t1.labels[m1[0]] == t2.labels[m2[0]]:
+        if ids1[m1[0]] == ids2[m2[0]]:
+            return [], []
+        c1, c2 = t1.children[m1[0]], t2.children[m2[0]]
+        start = 0
+        while start < len(c1) and start < len(c2) and ids1[c1[start]] == ids2[c2[start]]:
+            start += 1
+        end1, end2 = len(c1), len(c2)
+        while end1 > start and end2 > start and ids1[c1[end1 - 1]] == ids2[c2[end2 - 1]]:
+            end1 -= 1
+            end2 -= 1
+        m1, m2 = c1[start:end1], c2[start:end2]
+    return m1, m2
+
+
+def distance(t1: Tree, t2: Tree, limit: Optional[int] = None, approximate: bool = False) -> int:
+    """
+    Exact edit distance between t1 and t2: identical subtrees around the
+    differences are stripped (see _residual) and the forests that remain
+    are compared. If the heuristic alignment's cost meets the label
+    histogram lower bound it is the distance; otherwise Zhang-Shasha runs
+    on those forests, capped just below that cost (or at limit). Either way
+    the result equals exact_distance.
+    Raises BoundExceeded if the distance is known to pass limit.
+
+    With approximate=True, differing forests are instead aligned child by
+    child (anchored on large identical runs, with Zhang-Shasha only up to
+    ZS_BUDGET). That is much faster on large trees but only an upper bound:
+    moved or reordered code can cost far more than the exact distance.
+    """
+    if limit is not None and lower_bound(t1, t2) > limit:
+        raise BoundExceeded()
+    if approximate:
+        aligner = _Aligner(t1, t2, limit)
+        aligner.align(t1.root, t2.root)
+        return aligner.cost
+
+    m1, m2 = _residual(t1, t2)
+    if not m1 or not m2:
+        dist = forest_distance(t1, m1, t2, m2)
+    else:
+        # The residual alone carries the whole distance, so its bound is sound
+        labels1 = [t1.labels[k] for r in m1 for k in range(t1.lmld[r], r + 1)]
+        labels2 = [t2.labels[k] for r in m2 for k in range(t2.lmld[r], r + 1)]
+        bound = _histogram_bound(labels1, labels2)
+        if limit is not None and bound > limit:
+            raise BoundExceeded()
+        # The heuristic alignment is the cost of a real edit script; when it
+        # meets the lower bound it is the distance and Zhang-Shasha is skipped
+        aligner = _Aligner(t1, t2, None)
+        aligner.align(t1.root, t2.root)
+        if aligner.cost == bound:
+            dist = bound
+        else:
+            # Only a distance below the alignment's cost (or within limit) matters
+            cap = aligner.cost - 1 if limit is None else min(aligner.cost - 1, limit)
+            dist = forest_distance(t1, m1, t2, m2, cap)
+            if dist > cap:
+                dist = aligner.cost if cap == aligner.cost - 1 else cap + 1
+    if limit is not None and dist > limit:
+        raise BoundExceeded()
+    return dist
+
+
+def exact_distance(t1: Tree, t2: Tree) -> int:
+    """Plain Zhang-Shasha on the whole trees."""
+    return zhang_shasha(t1.labels, t1.lmld, t2.labels, t2.lmld)
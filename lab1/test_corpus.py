@@ -0,0 +1,35 @@
+import corpus
+
+
+def function(i):
+    lines = [f"def f{i}(a, b):"]
+    for k in range(i + 1):
+        if k % 2:
+            lines += [f"    if a > {k}:", f"        a = a * b + {k}"]
+        else:
+            lines.append(f"    b = b - a * {k}")
+    lines.append("    return a + b")
+    return "\n".join(lines) + "\n"
+
+
+def test_moved_function_clone_is_found(tmp_path):
+    funcs = [function(i) for i in (5, 0, 4, 1, 3, 2)]
+    # The same module with its first function moved below three others:
+    # about 0.09 apart exactly, 0.27 by the child-by-child alignment
+    (tmp_path / "a.py").write_text("\n".join(funcs))
+    (tmp_path / "b.py").write_text("\n".join(funcs[1:4] + funcs[:1] + funcs[4:]))
+    (tmp_path / "c.py").write_text("import os\n\nprint(os.getcwd())\n")
+
+    n_files, groups, accepted = corpus.find_clones([str(tmp_path)], 0.15, workers=1)
+    a, b = str(tmp_path / "a.py"), str(tmp_path / "b.py")
+    assert n_files == 3
+    assert groups == [[a, b]]
+    assert 0 < accepted[a, b] < 0.1
+
+
+def test_pair_distance_is_bounded(tmp_path):
+    (tmp_path / "a.py").write_text(function(5))
+    (tmp_path / "b.py").write_text(function(1))
+    pair = (str(tmp_path / "a.py"), str(tmp_path / "b.py"))
+    assert corpus.pair_distance(pair, 0.05) is None
+    assert 0.05 < corpus.pair_distance(pair, 1.0) <= 1.0
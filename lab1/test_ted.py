@@ -0,0 +1,100 @@
+import ast
+import random
+
+import pytest
+
+import ted
+from treeops import NodeVisitor
+
+
+def random_function(rng, name):
+    lines = [f"def {name}(a, b):"]
+    for k in range(rng.randint(1, 4)):
+        var = rng.choice("xyz")
+        if rng.random() < 0.3:
+            lines.append(f"    if {var} > {k}:")
+            lines.append(f"        {var} = a * {k}")
+        else:
+            lines.append(f"    {var} = {rng.choice('ab')} {rng.choice('+*-')} {k}")
+    lines.append(f"    return {rng.choice('xyzab')}")
+    return "\n".join(lines)
+
+
+def random_pair(rng):
+    # A module and an edited copy: functions moved, dropped, added or changed
+    funcs = [random_function(rng, f"f{i}") for i in range(rng.randint(2, 4))]
+    edited = list(funcs)
+    for _ in range(rng.randint(1, 3)):
+        kind = rng.randrange(4)
+        if kind == 0 and len(edited) > 1:
+            edited.insert(rng.randrange(len(edited)), edited.pop(rng.randrange(len(edited))))
+        elif kind == 1 and len(edited) > 1:
+            edited.pop(rng.randrange(len(edited)))
+        elif kind == 2:
+            edited.insert(rng.randrange(len(edited) + 1), random_function(rng, "g"))
+        else:
+            k = rng.randrange(len(edited))
+            edited[k] = edited[k].replace("+", "*", 1).replace("return", "return 1 +", 1)
+    return "\n".join(funcs) + "\n", "\n".join(edited) + "\n"
+
+
+def trees(src1, src2):
+    ids = {}
+    return (ted.Tree(ast.parse(src1), NodeVisitor.get_children, NodeVisitor.get_label, ids),
+            ted.Tree(ast.parse(src2), NodeVisitor.get_children, NodeVisitor.get_label, ids))
+
+
+def moved_function_pair():
+    funcs = [random_function(random.Random(i), f"f{i}") for i in range(6)]
+    moved = funcs[1:4] + funcs[:1] + funcs[4:]
+    return "\n".join(funcs) + "\n", "\n".join(moved) + "\n"
+
+
+def test_distance_is_exact_on_random_pairs():
+    rng = random.Random(0)
+    for _ in range(40):
+        t1, t2 = trees(*random_pair(rng))
+        exact = ted.exact_distance(t1, t2)
+        assert ted.lower_bound(t1, t2) <= exact
+        assert ted.distance(t1, t2) == exact
+
+
+def test_distance_matches_zss_on_random_pairs():
+    zss = pytest.importorskip("zss")
+    rng = random.Random(1)
+    for _ in range(20):
+        src1, src2 = random_pair(rng)
+        n1, n2 = ast.parse(src1), ast.parse(src2)
+        expected = zss.simple_distance(n1, n2, NodeVisitor.get_children, NodeVisitor.get_label)
+        assert ted.distance(*trees(src1, src2)) == expected
+
+
+def test_moved_function_is_exact():
+    t1, t2 = trees(*moved_function_pair())
+    exact = ted.exact_distance(t1, t2)
+    assert ted.distance(t1, t2) == exact
+    # The heuristic alignment is only an upper bound
+    assert ted.distance(t1, t2, approximate=True) >= exact
+
+
+def test_limit_is_sound():
+    rng = random.Random(2)
+    for _ in range(20):
+        t1, t2 = trees(*random_pair(rng))
+        exact = ted.exact_distance(t1, t2)
+        assert ted.distance(t1, t2, exact) == exact
+        if exact:
+            with pytest.raises(ted.BoundExceeded):
+                ted.distance(t1, t2, exact - 1)
+
+
+def test_capped_zhang_shasha():
+    rng = random.Random(3)
+    for _ in range(20):
+        t1, t2 = trees(*random_pair(rng))
+        exact = ted.exact_distance(t1, t2)
+        for cap in (0, exact // 2, exact - 1, exact, exact + 3):
+            if cap < 0:
+                continue
+            capped = ted.zhang_shasha(t1.labels, t1.lmld, t2.labels, t2.lmld, cap)
+            assert capped == min(exact, cap + 1)
@@ -0,0 +1,66 @@
+import ast
+import sys
+
+import pytest
+
+from treeops import Program, do_run_batch, load_inputs, same_tree, subtree_hashes
+
+
+def test_same_tree():
+    src = "def f(a):\n    return a + 1\n"
+    n1, n2, n3 = ast.parse(src), ast.parse(src), ast.parse(src.replace("1", "2"))
+    assert same_tree(n1, n2)
+    assert not same_tree(n1, n3)
+    hashes = {}
+    for tree in (n1, n2, n3):
+        subtree_hashes(tree, hashes)
+    assert same_tree(n1, n2, hashes)
+    assert not same_tree(n1, n3, hashes)
+    # Only hashes the caller already has are used
+    assert same_tree(n1, ast.parse(src), hashes)
+
+
+BATCH_SOURCE = """
+a = x * 2 + y
+b = a * a + z
+c = b + missing
+"""
+
+
+def test_run_batch_matches_run_per_row():
+    np = pytest.importorskip("numpy")
+    columns = {"x": [1, 2, -3, 40], "y": [0, 5, 7, -1], "z": [1.5, 0.0, -2.25, 3.0]}
+    program = Program(ast.parse(BATCH_SOURCE))
+    expected = [program.run({name: values[k] for name, values in columns.items()})[0] for k in range(4)]
+    assert np.array_equal(program.run_batch(columns), expected)
+    # No known assignment: None for every row, as run() gives
+    assert list(Program(ast.parse("c = missing")).run_batch(columns)) == [None] * 4
+
+
+def test_run_batch_rejects_uneven_columns():
+    with pytest.raises(ValueError, match="x=2, y=1"):
+        Program(ast.parse(BATCH_SOURCE)).run_batch({"x": [1, 2], "y": [3]})
+
+
+def test_run_batch_without_numpy(tmp_path, monkeypatch, capsys):
+    monkeypatch.setitem(sys.modules, "numpy", None)
+    (tmp_path / "p.py").write_text(BATCH_SOURCE)
+    (tmp_path / "in.csv").write_text("x,y,z\n1,2,3\n")
+    do_run_batch(str(tmp_path / "p.py"), str(tmp_path / "in.csv"))
+    assert "needs numpy" in capsys.readouterr().out
+
+
+@pytest.mark.parametrize("text, error", [
+    ("", "no header row"),
+    ("x,y\n1,2\n3\n", ":3: expected 2 values, got 1"),
+    ("x,y\n1,two\n", "column y"),
+])
+def test_load_inputs_errors(tmp_path, text, error):
+    (tmp_path / "in.csv").write_text(text)
+    with pytest.raises(ValueError, match=error):
+        load_inputs(str(tmp_path / "in.csv"))
+
+
+def test_load_inputs(tmp_path):
+    (tmp_path / "in.csv").write_text("x, y\n1,2.5\n\n3,4\n")
+    assert load_inputs(str(tmp_path / "in.csv")) == {"x": [1, 3], "y": [2.5, 4.0]}
@@ -1,19 +1,27 @@
 import sys
 import ast
-import zss
+import csv
+import hashlib
+from typing import Dict
 
-class NodeVisitor(ast.NodeVisitor):
-
-    len = 0
+import ted
 
-    vars = {}
+class NodeVisitor(ast.NodeVisitor):
+    """
+    Counts nodes and evaluates assignments as it visits. All state is per
+    instance, so separate visitors can run side by side, e.g. one per thread.
+    """
+    def __init__(self, vars: Dict = None):
+        self.len = 0
+        self.vars = {} if vars is None else vars
+        self.final_var = None
 
-    final_var = None
-    
     def generic_visit(self, node):
-        assign_eq(node, NodeVisitor.vars)
+        value = assign_eq(node, self.vars)
+        if value is not None:
+            self.final_var = value
         if node.__class__.__name__ != "Load" and node.__class__.__name__ != "Store":
-            NodeVisitor.len += 1
+            self.len += 1
         super().generic_visit(node)
 
     @staticmethod
@@ -27,30 +35,86 @@ class NodeVisitor(ast.NodeVisitor):
         return node.__class__.__name__
 
 
+def count_nodes(root: ast.AST) -> int:
+    """The number of nodes NodeVisitor would count under root, in one pass with no shared state."""
+    count = 0
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if not isinstance(node, (ast.Load, ast.Store)):
+            count += 1
+        stack.extend(ast.iter_child_nodes(node))
+    return count
+
+def _hash_value(h, value, hashes):
+    # Length-prefixed so that adjacent fields can never run into each other
+    if isinstance(value, ast.AST):
+        data = hashes[value]
+    elif isinstance(value, list):
+        h.update(b"[" + len(value).to_bytes(4, "little"))
+        for item in value:
+            _hash_value(h, item, hashes)
+        return
+    else:
+        data = f"{type(value).__name__}:{value!r}".encode()
+    h.update(len(data).to_bytes(4, "little"))
+    h.update(data)
+
+def subtree_hashes(root: ast.AST, hashes: Dict[ast.AST, bytes] = None) -> Dict[ast.AST, bytes]:
+    """
+    Merkle hash of every subtree under root, from its node type, field names
+    and field values (children by their own hash). Pass the dict back in to
+    extend it; subtrees already in it are not hashed again.
+    """
+    if hashes is None:
+        hashes = {}
+    stack = [(root, False)]
+    while stack:
+        node, ready = stack.pop()
+        if node in hashes:
+            continue
+        if not ready:
+            stack.append((node, True))
+            stack.extend((child, False) for child in ast.iter_child_nodes(node) if child not in hashes)
+            continue
+        h = hashlib.blake2b(digest_size=16)
+        h.update(type(node).__name__.encode())
+        for field, value in ast.iter_fields(node):
+            h.update(b"\0" + field.encode())
+            _hash_value(h, value, hashes)
+        hashes[node] = h.digest()
+    return hashes
+
 def compare_nodes(n1, n2):
+    # Field by field; lists and field sets must match in length too
     if type(n1) != type(n2):
         return False
 
-    for (field1, value1), (field2, value2) in zip(ast.iter_fields(n1), ast.iter_fields(n2)):
-        if field1 != field2:
+    if isinstance(n1, ast.AST):
+        fields1 = list(ast.iter_fields(n1))
+        fields2 = list(ast.iter_fields(n2))
+        if len(fields1) != len(fields2):
             return False
-
-        if isinstance(value1, list):
-            if len(value1) != len(value2):
+        for (field1, value1), (field2, value2) in zip(fields1, fields2):
+            if field1 != field2 or not compare_nodes(value1, value2):
                 return False
-            for child1, child2 in zip(value1, value2):
-                if not compare_nodes(child1, child2):
-                    return False
+        return True
 
-        elif isinstance(value1, ast.AST):
-            if not compare_nodes(value1, value2):
-                return False
+    if isinstance(n1, list):
+        return len(n1) == len(n2) and all(compare_nodes(c1, c2) for c1, c2 in zip(n1, n2))
 
-        else:
-            if value1 != value2:
-                return False
+    return n1 == n2
 
-    return True
+def same_tree(n1, n2, hashes: Dict[ast.AST, bytes] = None) -> bool:
+    """
+    Whether n1 and n2 are identical. A caller that already holds subtree
+    hashes for both gets a mismatch answered at once; otherwise hashing
+    both trees costs more than one compare_nodes walk, which stops at the
+    first difference.
+    """
+    if hashes is not None and n1 in hashes and n2 in hashes and hashes[n1] != hashes[n2]:
+        return False
+    return compare_nodes(n1, n2)
 
 def expr_eq(node, vars):
     if node.__class__.__name__ == "BinOp":
@@ -68,57 +132,236 @@ def expr_eq(node, vars):
     return None
 
 def assign_eq(node, vars):
+    # Returns the value assigned, or None if node assigned nothing
     if node.__class__.__name__ == "Assign":
         target = node.targets[0].id
         value = expr_eq(node.value, vars)
         if value is not None:
             vars[target] = value
-            NodeVisitor.final_var = value
+            return value
+    return None
+
+def _unknown(env):
+    return None
+
+def compile_expr(node):
+    """
+    Compiles an expression once into a closure env -> value, with the same
+    rules as expr_eq: + and * over known values, names from env, constants;
+    anything else (or any unknown operand) evaluates to None. Like expr_eq,
+    both operands of every binary operation are evaluated, so type errors
+    surface the same way.
+    """
+    if isinstance(node, ast.Constant):
+        value = node.value
+        return lambda env: value
+    if isinstance(node, ast.Name):
+        name = node.id
+        return lambda env: env.get(name)
+    if not isinstance(node, ast.BinOp):
+        return _unknown
+
+    left, right = compile_expr(node.left), compile_expr(node.right)
+    if not isinstance(node.op, (ast.Add, ast.Mult)):
+        if left is _unknown and right is _unknown:
+            return _unknown
+
+        def unsupported(env):
+            left(env)
+            right(env)
+            return None
+        return unsupported
+
+    add = isinstance(node.op, ast.Add)
+    if isinstance(node.left, ast.Constant) and isinstance(node.right, ast.Constant):
+        # Fold constant operands at compile time
+        l, r = node.left.value, node.right.value
+        if l is None or r is None:
+            return _unknown
+        value = l + r if add else l * r
+        return lambda env: value
+
+    def binop(env):
+        l = left(env)
+        r = right(env)
+        if l is None or r is None:
+            return None
+        return l + r if add else l * r
+    return binop
+
+# Nodes whose children can include statements; expressions never hold an Assign
+_STATEMENT_HOLDERS = (ast.mod, ast.stmt, ast.excepthandler, ast.match_case)
+
+class Program:
+    """
+    The assignments of a module compiled once, in the order NodeVisitor
+    reaches them; run() can be called any number of times.
+    """
+    def __init__(self, tree: ast.AST):
+        self.steps = []
+        stack = [tree]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, ast.Assign):
+                if isinstance(node.targets[0], ast.Name):
+                    self.steps.append((node.targets[0].id, compile_expr(node.value)))
+                continue
+            stack.extend(reversed([child for child in ast.iter_child_nodes(node)
+                                   if isinstance(child, _STATEMENT_HOLDERS)]))
+
+    def run(self, env: Dict = None):
+        """Returns (value of the last known assignment, env); each run gets a fresh env unless one is passed."""
+        if env is None:
+            env = {}
+        final = None
+        for target, expr in self.steps:
+            value = expr(env)
+            if value is not None:
+                env[target] = value
+                final = value
+        return final, env
+
+    def run_batch(self, columns: Dict):
+        """
+        Runs the program once over whole columns of inputs: columns maps
+        variable names to equal-length arrays, one entry per input row, and
+        + and * act on the arrays elementwise. Returns an array with the
+        result of every row. Every row knows the same variables, so an
+        assignment is skipped for all rows or for none, just as run() would
+        for each row on its own. Integer columns are int64 and wrap on
+        overflow, where run() would grow the int. Raises ValueError if the
+        columns differ in length and ImportError if numpy is missing.
+        """
+        lengths = {name: len(values) for name, values in columns.items()}
+        if len(set(lengths.values())) > 1:
+            raise ValueError("columns differ in length: " + ", ".join(f"{name}={n}" for name, n in lengths.items()))
+        try:
+            import numpy as np
+        except ImportError as e:
+            raise ImportError("running over a CSV of inputs needs numpy (pip install numpy)") from e
+        columns = {name: np.asarray(values) for name, values in columns.items()}
+        rows = len(next(iter(columns.values()))) if columns else 1
+        final, _ = self.run(columns)
+        if final is None:
+            return np.full(rows, None, dtype=object)
+        return np.broadcast_to(np.asarray(final), (rows,))
 
 def main():
     if len(sys.argv) == 4 and sys.argv[1] == "cmp":
         return do_cmp(sys.argv[2], sys.argv[3])
     elif len(sys.argv) == 4 and sys.argv[1] == "dst":
         return do_dst(sys.argv[2], sys.argv[3])
+    elif len(sys.argv) == 5 and sys.argv[1] == "dst":
+        return do_dst(sys.argv[2], sys.argv[3], float(sys.argv[4]))
+    elif len(sys.argv) >= 4 and sys.argv[1] == "corpus":
+        return do_corpus(float(sys.argv[2]), sys.argv[3:])
     elif len(sys.argv) == 3 and sys.argv[1] == "run":
         return do_run(sys.argv[2])
+    elif len(sys.argv) == 4 and sys.argv[1] == "run":
+        return do_run_batch(sys.argv[2], sys.argv[3])
     else:
         print("Usage: python treeops.py <cmd> <file 1> <optional file 2>")
+        print("       python treeops.py dst <file 1> <file 2> <max normalized distance>")
+        print("       python treeops.py corpus <max normalized distance> <file|dir|glob>...")
+        print("       python treeops.py run <file> <inputs.csv>")
         return -1
 
 # Provide the solution to Exercise 2 by implementing the function below
 def do_cmp(fname1, fname2):
     n1 = ast.parse(open(fname1).read())
     n2 = ast.parse(open(fname2).read())
-    if compare_nodes(n1, n2):
+    if same_tree(n1, n2):
         print("The programs are identical")
     else:
         print("The programs are not identical")
     return -1
 
 # Provide the solution to Exercise 3 by implementing the function below
-def do_dst(fname1, fname2):
+def do_dst(fname1, fname2, bound=None):
     n1 = ast.parse(open(fname1).read())
     n2 = ast.parse(open(fname2).read())
-    dist = zss.simple_distance(n1, n2, NodeVisitor.get_children, NodeVisitor.get_label)
-    v = NodeVisitor()
-    v.visit(n1)
-    n1_len = NodeVisitor.len
-    NodeVisitor.len = 0
-    v.visit(n2)
-    n2_len = NodeVisitor.len
-    normalized_dist = dist / (n1_len + n2_len)
+    if bound is not None:
+        # The size difference alone is a lower bound on the distance
+        size1, size2 = count_nodes(n1), count_nodes(n2)
+        if abs(size1 - size2) > int(bound * (size1 + size2)):
+            print(f"The normalized tree edit distance exceeds {bound}")
+            return -1
+    # Identical subtrees are skipped; exact TED only runs where the trees differ
+    ids = {}
+    t1 = ted.Tree(n1, NodeVisitor.get_children, NodeVisitor.get_label, ids)
+    t2 = ted.Tree(n2, NodeVisitor.get_children, NodeVisitor.get_label, ids)
+    total = len(t1) + len(t2)
+    try:
+        dist = ted.distance(t1, t2, None if bound is None else int(bound * total))
+    except ted.BoundExceeded:
+        print(f"The normalized tree edit distance exceeds {bound}")
+        return -1
+    normalized_dist = dist / total
     print(f"The normalized tree edit distance is {normalized_dist}")
     return -1
 
+# Near-duplicate clusters across many files
+def do_corpus(max_dist, patterns):
+    import corpus
+    n_files, groups, pairs = corpus.find_clones(patterns, max_dist)
+    print(f"{n_files} files, {len(groups)} clusters within normalized distance {max_dist}")
+    for k, group in enumerate(groups, 1):
+        print(f"Cluster {k}: {len(group)} files")
+        for fname in group:
+            print(f"    {fname}")
+        for (a, b), dist in sorted(pairs.items()):
+            if a in group:
+                print(f"    {a} ~ {b}: {dist:.4f}")
+    return -1
+
 # Provide the solution to Exercise 4 by implementing the function below
 def do_run(fname):
     node = ast.parse(open(fname).read())
-    v = NodeVisitor()
-    v.visit(node)
-    print(f'The result is {NodeVisitor.final_var}')
+    result, _ = Program(node).run()
+    print(f'The result is {result}')
+    return -1
+
+def _column(values):
+    # ints if every entry is one, floats otherwise
+    try:
+        return [int(v) for v in values]
+    except ValueError:
+        return [float(v) for v in values]
+
+def load_inputs(fname) -> Dict:
+    """
+    A CSV with a header row of variable names and one input row per line, as
+    columns. Raises ValueError, naming the file and line, if the header is
+    missing, a row has the wrong number of values or a value is not a number.
+    """
+    with open(fname, newline="") as f:
+        rows = [(lineno, row) for lineno, row in enumerate(csv.reader(f), 1) if row]
+    if not rows:
+        raise ValueError(f"{fname}: no header row of variable names")
+    (_, header), rows = rows[0], rows[1:]
+    for lineno, row in rows:
+        if len(row) != len(header):
+            raise ValueError(f"{fname}:{lineno}: expected {len(header)} values, got {len(row)}")
+    columns = {}
+    for k, name in enumerate(header):
+        try:
+            columns[name.strip()] = _column([row[k] for _, row in rows])
+        except ValueError:
+            raise ValueError(f"{fname}: column {name.strip()} holds a value that is not a number") from None
+    return columns
+
+# Exercise 4 over many inputs: one vectorized run for every row of the CSV
+def do_run_batch(fname, inputs):
+    node = ast.parse(open(fname).read())
+    try:
+        results = Program(node).run_batch(load_inputs(inputs))
+    except (ImportError, ValueError) as e:
+        print(f"Error: {e}")
+        return -1
+    for k, result in enumerate(results):
+        print(f'Row {k}: the result is {result}')
     return -1
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
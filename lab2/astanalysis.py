@@ -1,30 +1,212 @@
 import sys
 import ast
+import os
+import io
+import contextlib
+import functools
+import mmap
 
 import re
+import symtable
 from xmlrpc.client import boolean
 
+# Helpers shared by the labs live in labtools/ at the top of the repo
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from labtools.files import collect_files
+from labtools.result_cache import ResultCache, source_version
+
+# Returned by an enter_<Type> handler to stop its checker descending into the node
+SKIP_CHILDREN = "skip_children"
+
+# Rule files list one rule per line, "<name> <pattern>"; # starts a comment
+DEFAULT_SECRET_RULES = [("wowsecret", r"WOWSECRET_\d{2,5}_[A-Z]{4}")]
+
+def _literal_prefix(pattern):
+    # The literal text every match of pattern starts with, or "" if unsure
+    if "|" in pattern:
+        return ""
+    i = 1 if pattern.startswith("^") else 0
+    start = i
+    while i < len(pattern) and (pattern[i].isalnum() or pattern[i] in "_-:/=@"):
+        i += 1
+    if i < len(pattern) and pattern[i] in "?*+{":
+        # The last character is quantified
+        i -= 1
+    return pattern[start:max(i, start)]
+
+# Leading global flags, which are only allowed at the start of a whole regex
+_GLOBAL_FLAGS = re.compile(r"(?:\(\?[aiLmsux]+\))+")
+
+# Back-references by number or name, conditionals and named groups: inside the
+# alternation group numbers shift and names can clash
+_GROUP_REFERENCES = re.compile(r"\\[1-9]|\(\?P[=<]|\(\?\(")
+
+def _scoped(pattern):
+    # "(?i)abc" -> "(?i:abc)", which can sit inside the alternation
+    m = _GLOBAL_FLAGS.match(pattern)
+    if m is None:
+        return pattern
+    flags = "".join(sorted(set(m.group()) - set("(?)")))
+    # In verbose mode a trailing comment would swallow the closing parenthesis
+    end = "\n)" if "x" in flags else ")"
+    return f"(?{flags}:{pattern[m.end():]}{end}"
+
+class SecretRules:
+    """
+    A set of named secret formats compiled into one alternation, so a string
+    is scanned once however many rules there are. Each rule is a pattern the
+    whole string must match. Leading global flags such as (?i) apply to their
+    own rule only; rules that refer to their own groups are compiled apart
+    and tried after the alternation. When every rule starts with literal
+    text (such as WOWSECRET_), strings without one of those prefixes are
+    rejected before any regex runs.
+    """
+    def __init__(self, rules, name_pattern=r"(?i)(secret|password|key|token)"):
+        self.names = {}
+        self.separate = []
+        alternatives = []
+        for index, (name, pattern) in enumerate(rules):
+            compiled = re.compile(pattern)
+            if _GROUP_REFERENCES.search(pattern):
+                self.separate.append((name, compiled))
+                continue
+            self.names[f"_{index}"] = name
+            alternatives.append(f"(?P<_{index}>{_scoped(pattern)})")
+        self.combined = re.compile("|".join(alternatives)) if alternatives else None
+        self.name_regex = re.compile(name_pattern)
+
+        prefixes = [_literal_prefix(pattern) for _, pattern in rules]
+        if prefixes and all(prefixes):
+            # Drop prefixes that a shorter one already covers
+            prefixes.sort()
+            kept = [prefixes[0]]
+            for prefix in prefixes[1:]:
+                if not prefix.startswith(kept[-1]):
+                    kept.append(prefix)
+            self.prefixes = tuple(kept)
+            self.anchor = re.compile(b"|".join(re.escape(prefix.encode()) for prefix in kept))
+        else:
+            self.prefixes = None
+            self.anchor = None
+
+    @classmethod
+    def from_file(cls, path):
+        rules = []
+        with open(path, encoding="utf-8") as f:
+            for lineno, line in enumerate(f, 1):
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                parts = line.split(None, 1)
+                if len(parts) != 2:
+                    raise ValueError(f"{path}:{lineno}: expected '<name> <pattern>', got {line!r}")
+                name, pattern = parts
+                try:
+                    re.compile(pattern)
+                except re.error as e:
+                    raise ValueError(f"{path}:{lineno}: bad pattern for rule {name}: {e}") from None
+                rules.append((name, pattern))
+        return cls(rules)
+
+    def may_contain(self, data):
+        """
+        False only if data (bytes or an mmap of source text) cannot hold a
+        matching string literal: no rule prefix occurs anywhere in it. A
+        secret spelled with escape sequences or split by implicit
+        concatenation does not appear verbatim and is missed.
+        """
+        if self.anchor is None:
+            return True
+        return self.anchor.search(data) is not None
+
+    def file_may_contain(self, path):
+        # Searches the file through mmap, without reading it into memory
+        if self.anchor is None:
+            return True
+        with open(path, "rb") as f:
+            try:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    return self.may_contain(data)
+            except ValueError:
+                # Empty files cannot be mapped
+                return False
+
+    def check_name(self, name):
+        return bool(self.name_regex.search(name))
+
+    def match(self, s):
+        """The name of the rule s matches, or None."""
+        if self.prefixes is not None and not s.startswith(self.prefixes):
+            return None
+        m = self.combined.fullmatch(s) if self.combined is not None else None
+        if m:
+            return self.names[m.lastgroup]
+        for name, compiled in self.separate:
+            if compiled.fullmatch(s):
+                return name
+        return None
+
+@functools.lru_cache(maxsize=None)
+def load_secret_rules(path=None):
+    return SecretRules.from_file(path) if path else SecretRules(DEFAULT_SECRET_RULES)
+
+def secret_rules_from_env():
+    # SECRET_RULES=<file> replaces the built-in rules
+    return load_secret_rules(os.environ.get("SECRET_RULES"))
+
 class SecretAnalyzer(ast.NodeVisitor):
+    """
+    Flags string constants that match a secret rule and are bound to a
+    secret-looking name: assigned (with or without annotation), passed as a
+    keyword argument or stored under a dict key.
+    """
+    def __init__(self, rules=None):
+        self.rules = rules if rules is not None else secret_rules_from_env()
+        self.messages = []
+
+    def check_keyword(self, name):
+        return self.rules.check_name(name)
+
+    def check_string(self, s):
+        return self.rules.match(s) is not None
+
+    def check_value(self, name, value):
+        # Is value a string constant matching a rule, bound to a secret-looking name?
+        return (isinstance(value, ast.Constant) and isinstance(value.value, str)
+                and self.check_keyword(name) and self.check_string(value.value))
+
+    def enter_Assign(self, node):
+        for target in node.targets:
+            if isinstance(target, ast.Name) and self.check_value(target.id, node.value):
+                self.messages.append(f"Variable {target.id} assigned possible secret {node.value.value}")
 
-    varRegex = re.compile(r"(?i)(secret|password|key|token)")
+    def enter_AnnAssign(self, node):
+        if isinstance(node.target, ast.Name) and self.check_value(node.target.id, node.value):
+            self.messages.append(f"Variable {node.target.id} assigned possible secret {node.value.value}")
 
-    stringRegex = re.compile(r"^WOWSECRET_\d{2,5}_[A-Z]{4}$")
+    def enter_keyword(self, node):
+        if node.arg is not None and self.check_value(node.arg, node.value):
+            self.messages.append(f"Keyword argument {node.arg} passed possible secret {node.value.value}")
 
-    @staticmethod
-    def check_keyword(name):
-        return bool(SecretAnalyzer.varRegex.search(name))
-        
-    @staticmethod
-    def check_string(s):
-        return bool(SecretAnalyzer.stringRegex.fullmatch(s))
+    def enter_Dict(self, node):
+        for key, value in zip(node.keys, node.values):
+            if isinstance(key, ast.Constant) and isinstance(key.value, str) and self.check_value(key.value, value):
+                self.messages.append(f"Dict key {key.value} maps to possible secret {value.value}")
 
     def visit_Assign(self, node):
-        for target in node.targets:
-            if isinstance(target, ast.Name):
-                if self.check_keyword(target.id):
-                    if isinstance(node.value, ast.Constant) and isinstance(node.value.value, str):
-                        if self.check_string(node.value.value):
-                            print(f"Variable {target.id} assigned possible secret {node.value.value}")
+        self.enter_Assign(node)
+        return self.generic_visit(node)
+
+    def visit_AnnAssign(self, node):
+        self.enter_AnnAssign(node)
+        return self.generic_visit(node)
+
+    def visit_keyword(self, node):
+        self.enter_keyword(node)
+        return self.generic_visit(node)
+
+    def visit_Dict(self, node):
+        self.enter_Dict(node)
         return self.generic_visit(node)
 
     def generic_visit(self, node):
@@ -68,7 +250,14 @@ class TaintAnalyzer(ast.NodeVisitor):
 
     tainted_vars = set()
 
+    def __init__(self):
+        self.messages = []
+
     def visit_Assign(self, node):
+        self.enter_Assign(node)
+        return self.generic_visit(node)
+
+    def enter_Assign(self, node):
         for target in node.targets:
             if isinstance(target, ast.Tuple):
                 for elt in target.elts:
@@ -111,7 +300,7 @@ class TaintAnalyzer(ast.NodeVisitor):
             if isinstance(node.value, ast.Call):
                 if isinstance(node.value.func, ast.Name):
                     if node.value.func.id == "sanitized":
-                        return self.generic_visit(node)
+                        return
 
 
             for arg in node.value.args:
@@ -119,19 +308,19 @@ class TaintAnalyzer(ast.NodeVisitor):
                     for target in node.targets:
                         if isinstance(target, ast.Name):
                             self.tainted_vars.add(target.id)
-                    
-            
-        
-        return self.generic_visit(node)
-    
+
     def visit_Expr(self, node):
+        self.enter_Expr(node)
+
+    def enter_Expr(self, node):
         if isinstance(node.value, ast.Call):
             if isinstance(node.value.func, ast.Attribute):
                 func_name = f"{node.value.func.value.id}.{node.value.func.attr}"
                 if func_name in self.sinks:
                     for arg in node.value.args:
                         if isinstance(arg, ast.Name) and arg.id in self.tainted_vars:
-                            print("Unsafe data flow between source and sink detected")
+                            self.messages.append("Unsafe data flow between source and sink detected")
+        return SKIP_CHILDREN
 
     def generic_visit(self, node):
         return super().generic_visit(node)
@@ -140,23 +329,23 @@ class TaintAnalyzer(ast.NodeVisitor):
 class ConstantConditionVisitor(ast.NodeVisitor):
     constant_condition = False
 
-    def visit_If(self, node):
+    def __init__(self):
+        self.messages = []
+
+    def enter_If(self, node):
         self.constant_check(node.test)
         if self.constant_condition == True:
-            print("Conditional statement with constant condition detected")
+            self.messages.append("Conditional statement with constant condition detected")
             self.constant_condition = False
-        # else:
-        #     print("no output")
 
+    enter_IfExp = enter_If
+
+    def visit_If(self, node):
+        self.enter_If(node)
         self.generic_visit(node)
     
     def visit_IfExp(self, node):
-        self.constant_check(node.test)
-        if self.constant_condition == True:
-            print("Conditional statement with constant condition detected")
-            self.constant_condition = False
-        # else:
-        #     print("no output")
+        self.enter_IfExp(node)
         self.generic_visit(node)
 
     def constant_check(self, node):
@@ -174,151 +363,616 @@ class ConstantConditionVisitor(ast.NodeVisitor):
             if left and rights:
                 self.constant_condition = True
                 
+class _Scope:
+    """One namespace: what it binds, what it declares global/nonlocal and the names it reads."""
+    def __init__(self, kind, name, parent):
+        self.kind = kind                # "module", "class", "function" or "comprehension"
+        self.name = name
+        self.parent = parent
+        self.children = []
+        self.bindings = set()           # every name bound here, however
+        self.variables = {}             # names bound by plain stores, in order of first store
+        self.globals = set()
+        self.nonlocals = set()
+        self.references = []            # names read here (loads and del)
+        self.used = set()
+        if parent is not None:
+            parent.children.append(self)
+
+    def bind(self, name):
+        self.bindings.add(name)
+
+    @property
+    def locals(self):
+        return self.bindings - self.globals - self.nonlocals
+
+_COMPREHENSIONS = (ast.ListComp, ast.SetComp, ast.GeneratorExp, ast.DictComp)
+
+# Nodes whose handlers look up the scope they are evaluated in
+_CLAIMED = {ast.Name, ast.Lambda, ast.NamedExpr, *_COMPREHENSIONS}
+
 class UnusedVariableChecker(ast.NodeVisitor):
+    """
+    Reports variables that functions store but never read, and variables
+    that shadow one bound in an enclosing function.
+
+    The enter_/leave_ handlers split the tree into scopes the way Python
+    does, in the same walk as any other checkers: function and lambda
+    arguments, class bodies, comprehensions (whose first iterable belongs
+    to the enclosing scope), walrus targets, imports and global/nonlocal
+    declarations each go to the right scope, and defaults, decorators,
+    annotations and class bases to the enclosing one. As in the symtable
+    module, x += 1 is a store to x, not a read.
+
+    Once the module is done, names are resolved with an index from each
+    name to the stack of open scopes that bind it, so every reference costs
+    O(1) instead of a walk over the enclosing scopes. Module and class level
+    names take part in resolution but are never reported.
+    """
     def __init__(self):
-        #dictionary to track unused, used, scope
-        self.stack = []
-        self.print1 =[]
-        self.print2 =[]
-        
+        self.print1 = []
+        self.print2 = []
+        self.module = None
+        self.scopes = []
+        # Nodes evaluated outside the scope they sit in, mapped to that scope
+        self.owner = {}
+
+    def visit(self, node):
+        if node.__class__ is ast.Module:
+            FusedVisitor([self]).visit(node)
+            return
+        # Any other root, e.g. a FunctionDef or an ast.Expression from
+        # mode="eval", is checked as the only content of a module
+        self.enter_Module(node)
+        FusedVisitor([self]).visit(node)
+        self.leave_Module(node)
+
+    def scope_of(self, node):
+        return self.owner.pop(node, None) or self.scopes[-1]
+
+    def claim(self, nodes, scope):
+        # Mark the names and nested scopes under nodes as evaluated in scope
+        stack = list(nodes)
+        while stack:
+            node = stack.pop()
+            if node.__class__ in _CLAIMED:
+                self.owner[node] = scope
+            if node.__class__ is not ast.Lambda and node.__class__ not in _COMPREHENSIONS:
+                stack.extend(ast.iter_child_nodes(node))
+
+    def enter_Module(self, node):
+        self.module = _Scope("module", "<module>", None)
+        self.scopes = [self.module]
+
+    def leave_Module(self, node):
+        self.analyse(self.module)
+
+    def enter_Name(self, node):
+        scope = self.owner.pop(node, None) or self.scopes[-1]
+        if node.ctx.__class__ is ast.Load:
+            scope.references.append(node.id)
+        else:
+            scope.bind(node.id)
+            if node.ctx.__class__ is ast.Store:
+                scope.variables.setdefault(node.id, node)
+            else:
+                scope.references.append(node.id)
+
+    def open_function(self, node, name, outside):
+        scope = self.scope_of(node)
+        args = node.args
+        inner = _Scope("function", name, scope)
+        outside = args.defaults + [d for d in args.kw_defaults if d is not None] + outside
+        for arg in args.posonlyargs + args.args + args.kwonlyargs + [args.vararg, args.kwarg]:
+            if arg is not None:
+                inner.bind(arg.arg)
+                if arg.annotation is not None:
+                    outside.append(arg.annotation)
+        self.claim(outside, scope)
+        self.scopes.append(inner)
+        return scope
+
+    def enter_FunctionDef(self, node):
+        returns = [node.returns] if node.returns else []
+        self.open_function(node, node.name, node.decorator_list + returns).bind(node.name)
+
+    def enter_Lambda(self, node):
+        self.open_function(node, "<lambda>", [])
+
+    def enter_ClassDef(self, node):
+        scope = self.scopes[-1]
+        scope.bind(node.name)
+        self.claim(node.decorator_list + node.bases + node.keywords, scope)
+        self.scopes.append(_Scope("class", node.name, scope))
+
+    def enter_ListComp(self, node):
+        scope = self.scope_of(node)
+        self.claim([node.generators[0].iter], scope)
+        self.scopes.append(_Scope("comprehension", "<comprehension>", scope))
+
+    def leave_FunctionDef(self, node):
+        self.scopes.pop()
+
+    enter_AsyncFunctionDef = enter_FunctionDef
+    enter_SetComp = enter_GeneratorExp = enter_DictComp = enter_ListComp
+    leave_AsyncFunctionDef = leave_Lambda = leave_ClassDef = leave_FunctionDef
+    leave_ListComp = leave_SetComp = leave_GeneratorExp = leave_DictComp = leave_FunctionDef
+
+    def enter_NamedExpr(self, node):
+        # The target belongs to the nearest enclosing non-comprehension scope
+        target = self.scope_of(node)
+        while target.kind == "comprehension":
+            target = target.parent
+        self.owner[node.target] = target
+
+    def enter_Global(self, node):
+        self.scopes[-1].globals.update(node.names)
+
+    def enter_Nonlocal(self, node):
+        self.scopes[-1].nonlocals.update(node.names)
+
+    def enter_Import(self, node):
+        for alias in node.names:
+            if alias.name != "*":
+                self.scopes[-1].bind(alias.asname or alias.name.split(".")[0])
+
+    enter_ImportFrom = enter_Import
+
+    def enter_ExceptHandler(self, node):
+        if node.name:
+            self.scopes[-1].bind(node.name)
+
+    def enter_MatchAs(self, node):
+        if node.name:
+            self.scopes[-1].bind(node.name)
+
+    enter_MatchStar = enter_MatchAs
+
+    def enter_MatchMapping(self, node):
+        if node.rest:
+            self.scopes[-1].bind(node.rest)
+
+    def analyse(self, module):
+        index = {}
+        # (scope, entered) frames: scopes are resolved on the way in and
+        # reported on the way out, innermost first
+        stack = [(module, False)]
+        while stack:
+            scope, entered = stack.pop()
+            if entered:
+                self.report(scope, index)
+                for name in scope.locals:
+                    index[name].pop()
+                continue
+            for name in scope.locals:
+                index.setdefault(name, []).append(scope)
+            for name in scope.references:
+                target = self.resolve(scope, name, index, module)
+                if target is not None:
+                    target.used.add(name)
+            stack.append((scope, True))
+            stack.extend((child, False) for child in reversed(scope.children))
 
-    def visit_FunctionDef(self, node):
-        # print1 = []
-        # print2 = []
-        #when we visit a function we append the stack 
-        self.stack.append({"func": node.name, "used_vars": set(), "unused_vars": set(), "shadowed": set()})
-        #visit next
-        self.generic_visit(node)
-        #save the scope so you can compare iwht it
-        saved_scope = self.stack.pop()
-        
-        for var in saved_scope["unused_vars"]:
-            if var not in saved_scope["used_vars"]:
-                self.print1.append(f"Variable {var} is defined but not used in scope {saved_scope['func']}")
+    @staticmethod
+    def resolve(scope, name, index, module):
+        # The scope whose binding of name a reference in scope sees
+        if name in scope.globals:
+            return module if name in module.locals else None
+        chain = index.get(name)
+        if not chain:
+            return None
+        # Class bodies are only visible to code directly inside them
+        k = len(chain) - 1
+        while k >= 0 and chain[k].kind == "class" and chain[k] is not scope:
+            k -= 1
+        return chain[k] if k >= 0 else None
+
+    def report(self, scope, index):
+        if scope.kind != "function":
+            return
+        local = scope.locals
+        for var in scope.variables:
+            if var in local and var not in scope.used:
+                self.print1.append(f"Variable {var} is defined but not used in scope {scope.name}")
+        for var in scope.variables:
+            if var in local and self.shadows(index[var]):
+                self.print2.append(f"Variable {var} is shadowed across scopes")
 
-####SHADOWING PRINT STMT STILL PRINTS BEFORE
-        #basically if the variable is in the outer scope and inner scope flag it.
-        #so if the variable is in the used/unused list then check if its in the scope before this
-        if self.stack: #sstack not empty
-            outer = self.stack[-1]
+    @staticmethod
+    def shadows(chain):
+        # chain[-1] is the scope itself; is the name bound in an enclosing function?
+        for outer in reversed(chain[:-1]):
+            if outer.kind != "class":
+                return outer.kind != "module"
+        return False
 
-            for var in saved_scope["shadowed"]:
-                self.print2.append(f"Variable {var} is shadowed across scopes")
-            
-        
+_COMPREHENSION_TABLES = {"listcomp", "setcomp", "dictcomp", "genexpr"}
+
+def symtable_unused(source, filename="<unknown>"):
+    """
+    The messages of UnusedVariableChecker, computed from the symbol tables
+    CPython builds while compiling, without an AST. A symbol read in a
+    nested scope shows up there as free and is credited to the innermost
+    open function that binds it, through the same name-to-scopes index.
+    symtable only knows that a name is assigned, not how, so
+    `except ... as e` and match captures count as variables and `del x`
+    as a store rather than a read; the order of variables within a scope
+    follows their first mention rather than their first store.
+    Returns (unused messages, shadowing messages).
+    """
+    print1, print2 = [], []
+    index = {}
+    # [table, names read in it or in nested scopes, what to do on leaving it]
+    stack = [[symtable.symtable(source, filename, "exec"), set(), None]]
+    while stack:
+        frame = stack[-1]
+        table, used, leave = frame
+        if leave is not None:
+            stack.pop()
+            name, variables, local = leave
+            if name is not None:
+                for var in variables:
+                    if var not in used:
+                        print1.append(f"Variable {var} is defined but not used in scope {name}")
+                for var in variables:
+                    if len(index[var]) > 1:
+                        print2.append(f"Variable {var} is shadowed across scopes")
+            for var in local:
+                index[var].pop()
+            continue
+
+        kind = table.get_type()
+        name, variables, local = None, [], []
+        if kind == "function":
+            # Only function scopes are visible to the scopes nested in them
+            for symbol in table.get_symbols():
+                var = symbol.get_name()
+                if symbol.is_local():
+                    local.append(var)
+                    index.setdefault(var, []).append(used)
+                    if symbol.is_referenced():
+                        used.add(var)
+                    if symbol.is_assigned() and not symbol.is_namespace() and not symbol.is_imported():
+                        variables.append(var)
+                elif symbol.is_free() and symbol.is_referenced() and index.get(var):
+                    index[var][-1].add(var)
+            if table.get_name() not in _COMPREHENSION_TABLES:
+                name = "<lambda>" if table.get_name() == "lambda" else table.get_name()
+        elif kind == "class":
+            for symbol in table.get_symbols():
+                var = symbol.get_name()
+                if symbol.is_free() and symbol.is_referenced() and index.get(var):
+                    index[var][-1].add(var)
+        # Module symbols are never free or reported; skipping them matters
+        # because building a Symbol scans every child table
+        frame[2] = (name, variables, local)
+        stack.extend([child, set(), None] for child in reversed(table.get_children()))
+    return print1, print2
+
+def _irrefutable(pattern):
+    # Does this match pattern accept every subject (case _, case x, case _ | ...)?
+    if isinstance(pattern, ast.MatchAs):
+        return pattern.pattern is None or _irrefutable(pattern.pattern)
+    if isinstance(pattern, ast.MatchOr):
+        return any(_irrefutable(p) for p in pattern.patterns)
+    return False
 
-# if a variable key value is false then it hasnt been used. If a variable key is anything else it is the func name 
-    def visit_Name(self, node):
-        #if it exists in a store context, it is not used
-        if isinstance(node.ctx, ast.Store):
-            #when a node is "stored" it is not used
-            self.stack[-1]["unused_vars"].add(node.id)
-
-            outer_vars = set()
-            for each_func in self.stack[:-1]:
-                outer_vars.update(each_func["used_vars"])
-                outer_vars.update(each_func["unused_vars"])
-
-            if node.id in outer_vars:
-                self.stack[-1]["shadowed"].add(node.id)
-
-        elif (node.ctx, ast.Load):
-            #when a node is "loaded" it is used so remove it from the unused_vars
-            for each_scope in reversed(self.stack):
-                if node.id in each_scope["unused_vars"]:
-                    each_scope["used_vars"].add(node.id)
-                    each_scope["unused_vars"].remove(node.id)
-                    break
+class ReturnFlowGraph:
+    """
+    CFG of one function body with only the edges of normal completion:
+    return and raise leave the graph, so its exit node is reachable from the
+    entry exactly when control can fall off the end of the body. Straight-line
+    statements pass their predecessors on instead of getting nodes; only
+    the entry, loop headers, join points and the exit do. Each statement is
+    linked once, so building and searching the graph is linear in the size
+    of the function.
+    """
+    def __init__(self, body):
+        self.succs = [[]]       # node 0 is the entry
+        self.loops = []         # (header node, break nodes) of the enclosing loops
+        self.exit = self.node(self.block(body, [0]))
+
+    def node(self, preds):
+        n = len(self.succs)
+        self.succs.append([])
+        for p in preds:
+            self.succs[p].append(n)
+        return n
+
+    def join(self, ends):
+        # One node for several paths meeting, so lists never grow along a body
+        return [self.node(ends)] if len(ends) > 1 else ends
+
+    def block(self, stmts, preds):
+        # Links stmts in sequence after preds; returns the nodes that complete normally
+        for stmt in stmts:
+            preds = self.statement(stmt, preds)
+        return preds
+
+    def statement(self, stmt, preds):
+        if isinstance(stmt, (ast.Return, ast.Raise)):
+            return []
+        if isinstance(stmt, ast.If):
+            ends = []
+            # Walk elif chains iteratively so long ones cannot hit the recursion limit
+            while True:
+                ends += self.block(stmt.body, preds)
+                if len(stmt.orelse) == 1 and isinstance(stmt.orelse[0], ast.If):
+                    stmt = stmt.orelse[0]
+                    continue
+                return self.join(ends + self.block(stmt.orelse, preds))
+        if isinstance(stmt, (ast.While, ast.For, ast.AsyncFor)):
+            header = self.node(preds)
+            breaks = []
+            self.loops.append((header, breaks))
+            for end in self.block(stmt.body, [header]):
+                self.succs[end].append(header)
+            self.loops.pop()
+            # while True only ends through break
+            endless = isinstance(stmt, ast.While) and isinstance(stmt.test, ast.Constant) and bool(stmt.test.value)
+            return self.join(breaks + ([] if endless else self.block(stmt.orelse, [header])))
+        if isinstance(stmt, ast.Break):
+            if self.loops:
+                self.loops[-1][1].extend(preds)
+            return []
+        if isinstance(stmt, ast.Continue):
+            if self.loops:
+                for p in preds:
+                    self.succs[p].append(self.loops[-1][0])
+            return []
+        if isinstance(stmt, (ast.Try, ast.TryStar)):
+            # Any statement of the body may raise, so every handler can be entered
+            ends = self.block(stmt.orelse, self.block(stmt.body, preds))
+            for handler in stmt.handlers:
+                ends += self.block(handler.body, preds)
+            return self.block(stmt.finalbody, self.join(ends))
+        if isinstance(stmt, (ast.With, ast.AsyncWith)):
+            return self.block(stmt.body, preds)
+        if isinstance(stmt, ast.Match):
+            ends = []
+            for case in stmt.cases:
+                ends += self.block(case.body, preds)
+                if case.guard is None and _irrefutable(case.pattern):
+                    return self.join(ends)
+            # No case has to match
+            return self.join(ends + preds)
+        return preds
+
+    def falls_off_end(self):
+        seen = [False] * len(self.succs)
+        seen[0] = True
+        stack = [0]
+        while stack:
+            for succ in self.succs[stack.pop()]:
+                if not seen[succ]:
+                    seen[succ] = True
+                    stack.append(succ)
+        return seen[self.exit]
 
 class MissingReturnChecker(ast.NodeVisitor):
 
-    def check_if_block(self, node):
-        for node in reversed(node.body):
-            if isinstance(node, ast.If):
-                if self.check_if_block(node) and self.check_else_block(node):
-                    return True
-            if isinstance(node, ast.Return):
-                return True
-
-    def check_else_block(self, node):
-        for node in reversed(node.orelse):
-            if isinstance(node, ast.If):
-                if self.check_if_block(node) and self.check_else_block(node):
-                    return True
-            if isinstance(node, ast.Return):
-                return True
-        return False
-
-    def check_func_block(self, node):
-        for node in reversed(node.body):
-            if isinstance(node, ast.If):
-                if self.check_if_block(node) and self.check_else_block(node):
-                    return True
-            if isinstance(node, ast.Return):
-                return True
-        return False
+    def __init__(self):
+        self.messages = []
 
     def visit_FunctionDef(self, node):
-        if not self.check_func_block(node):
-            print(f"Function {node.name} is missing a return statement")
+        self.enter_FunctionDef(node)
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def enter_FunctionDef(self, node):
+        # One reachability query: can control reach the end of the body?
+        if ReturnFlowGraph(node.body).falls_off_end():
+            self.messages.append(f"Function {node.name} is missing a return statement")
+        # nested functions are not checked separately
+        return SKIP_CHILDREN
+
+    enter_AsyncFunctionDef = enter_FunctionDef
 
     def generic_visit(self, node):
         return super().generic_visit(node)
+
+class FusedVisitor:
+    """
+    Runs several checkers in a single walk of the tree.
+
+    Each checker exposes enter_<Type>(node) and optionally leave_<Type>(node)
+    handlers. A table from node type to the handlers of every checker is built
+    once, so each node is dispatched with one dict lookup. An enter handler that
+    returns SKIP_CHILDREN stops only its own checker from seeing that subtree.
+    """
+    def __init__(self, checkers):
+        self.checkers = checkers
+        self.table = {}
+        for index, checker in enumerate(checkers):
+            for attr in dir(checker):
+                if not attr.startswith("enter_"):
+                    continue
+                node_type = getattr(ast, attr[len("enter_"):])
+                leave = getattr(checker, "leave_" + attr[len("enter_"):], None)
+                self.table.setdefault(node_type, []).append((index, getattr(checker, attr), leave))
+
+    def visit(self, tree):
+        table = self.table
+        skipping = [0] * len(self.checkers)
+        # Explicit stack of nodes to enter, and (leave handlers, resumed checkers) to run on the way out
+        stack = [tree]
+        while stack:
+            item = stack.pop()
+            if item.__class__ is tuple:
+                leaves, resumed = item
+                for leave, node in reversed(leaves):
+                    leave(node)
+                for index in resumed:
+                    skipping[index] -= 1
+                continue
+
+            handlers = table.get(item.__class__)
+            if handlers:
+                leaves = []
+                resumed = []
+                for index, enter, leave in handlers:
+                    if skipping[index]:
+                        continue
+                    if enter(item) == SKIP_CHILDREN:
+                        skipping[index] += 1
+                        resumed.append(index)
+                    if leave is not None:
+                        leaves.append((leave, item))
+                if leaves or resumed:
+                    stack.append((leaves, resumed))
+            children = list(ast.iter_child_nodes(item))
+            children.reverse()
+            stack.extend(children)
    
 def main():
-    if len(sys.argv) == 3 and sys.argv[1] == "unused":
-        return do_unused(sys.argv[2])
-    elif len(sys.argv) == 3 and sys.argv[1] == "returns":
-        return do_returns(sys.argv[2])
-    elif len(sys.argv) == 3 and sys.argv[1] == "constant":
-        return do_constant(sys.argv[2])
-    elif len(sys.argv) == 3 and sys.argv[1] == "secret":
-        return do_secret(sys.argv[2])
-    elif len(sys.argv) == 3 and sys.argv[1] == "taint":
-        return do_taint(sys.argv[2])
-    else:
-        print("Usage: python astanalysis.py <cmd> <file>")
-        return -1
+    # Set ANALYSIS_CACHE=<dir> to reuse results for unchanged files
+    # and SECRET_RULES=<file> to use other secret rules
+    sources = [os.path.abspath(__file__)]
+    if os.environ.get("SECRET_RULES"):
+        sources.append(os.environ["SECRET_RULES"])
+    cache = ResultCache.from_env(source_version(*sources))
+    try:
+        if len(sys.argv) == 3 and sys.argv[1] in CHECKERS:
+            return run_cached(sys.argv[1], sys.argv[2], cache)
+        elif len(sys.argv) == 3 and sys.argv[1] == "all":
+            return run_cached("all", sys.argv[2], cache)
+        elif len(sys.argv) >= 3 and sys.argv[1] == "secrets":
+            return do_secret_scan(sys.argv[2:])
+        else:
+            print("Usage: python astanalysis.py <cmd> <file>")
+            print("       python astanalysis.py secrets <file|dir|glob>...")
+            return -1
+    finally:
+        if cache is not None:
+            cache.report()
+
+def run_cached(cmd, fname, cache=None):
+    # Print the command's output, answered from the cache when this exact file
+    # content has been analysed before
+    check = do_all if cmd == "all" else CHECKERS[cmd]
+    if cache is None:
+        return check(fname)
+    with open(fname, "rb") as f:
+        content = f.read()
+    key = cache.key(content, cmd)
+    output = cache.get(key, len(content))
+    if output is None:
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            check(fname)
+        output = out.getvalue()
+        cache.put(key, output)
+    sys.stdout.write(output)
+    return -1
     
-# Exercise 1
-def do_unused(fname):
-    n1 = ast.parse(open(fname).read())
+class AnalysisSession:
+    """Parses a file once so every checker run through the session shares the AST."""
+    def __init__(self, fname):
+        self.fname = fname
+        self._tree = None
+
+    @property
+    def tree(self):
+        if self._tree is None:
+            with open(self.fname) as f:
+                self._tree = ast.parse(f.read(), filename=self.fname)
+        return self._tree
 
-    sc = UnusedVariableChecker()
-    sc.visit(n1)
-    for msg in sc.print1:
+# Exercise 1
+def do_unused(fname, session=None, use_symtable=False):
+    if use_symtable:
+        # Straight from CPython's symbol tables; the AST is never built
+        with open(fname) as f:
+            print1, print2 = symtable_unused(f.read(), fname)
+    else:
+        session = session or AnalysisSession(fname)
+        sc = UnusedVariableChecker()
+        sc.visit(session.tree)
+        print1, print2 = sc.print1, sc.print2
+    for msg in print1:
         print(msg)
-    for msg in sc.print2:
+    for msg in print2:
         print(msg)
     return -1
 
+def do_unused_symtable(fname, session=None):
+    return do_unused(fname, session, use_symtable=True)
+
 # Exercise 2
-def do_returns(fname):
-    n1 = ast.parse(open(fname).read())
+def do_returns(fname, session=None):
+    session = session or AnalysisSession(fname)
     rc = MissingReturnChecker()
-    rc.visit(n1)
+    rc.visit(session.tree)
+    for msg in rc.messages:
+        print(msg)
     return -1
 
 # Exercise 3
-def do_constant(fname):
-    with open(fname) as f:
-        tree = ast.parse(f.read(), filename=fname)
+def do_constant(fname, session=None):
+    session = session or AnalysisSession(fname)
     visitor = ConstantConditionVisitor()
-    visitor.visit(tree)
+    visitor.visit(session.tree)
+    for msg in visitor.messages:
+        print(msg)
     return -1
 
 # Exercise 4
-def do_secret(fname):
-    tree1 = ast.parse(open(fname).read())
+def do_secret(fname, session=None):
+    if session is None and not secret_rules_from_env().file_may_contain(fname):
+        # No rule prefix anywhere in the file; skip parsing it
+        return -1
+    session = session or AnalysisSession(fname)
     analyzer = SecretAnalyzer()
-    analyzer.visit(tree1)
+    analyzer.visit(session.tree)
+    for msg in analyzer.messages:
+        print(msg)
     return -1
 
 # Exercise 5
-def do_taint(fname):
-    tree1 = ast.parse(open(fname).read())
+def do_taint(fname, session=None):
+    session = session or AnalysisSession(fname)
     analyzer = TaintAnalyzer()
-    analyzer.visit(tree1)
+    analyzer.visit(session.tree)
+    for msg in analyzer.messages:
+        print(msg)
+    return -1
+
+# Exercise 4 over a whole tree; only files that pass the prefilter are parsed
+def do_secret_scan(patterns):
+    # Load the rules up front: a bad rules file is one error, not one per file
+    secret_rules_from_env()
+    for fname in collect_files(patterns):
+        out = io.StringIO()
+        try:
+            with contextlib.redirect_stdout(out):
+                do_secret(fname)
+        except (SyntaxError, ValueError, UnicodeDecodeError, OSError) as e:
+            print(f"{fname}: skipped, {e.__class__.__name__}", file=sys.stderr)
+            continue
+        for msg in out.getvalue().splitlines():
+            print(f"{fname}: {msg}")
+    return -1
+
+CHECKERS = {
+    "unused": do_unused,
+    "unused-symtable": do_unused_symtable,
+    "returns": do_returns,
+    "constant": do_constant,
+    "secret": do_secret,
+    "taint": do_taint,
+}
+
+def do_all(fname):
+    # One parse and one fused tree walk for every checker
+    session = AnalysisSession(fname)
+    unused = UnusedVariableChecker()
+    returns = MissingReturnChecker()
+    constant = ConstantConditionVisitor()
+    secret = SecretAnalyzer()
+    taint = TaintAnalyzer()
+    FusedVisitor([unused, returns, constant, secret, taint]).visit(session.tree)
+    for msg in unused.print1 + unused.print2 + returns.messages + constant.messages + secret.messages + taint.messages:
+        print(msg)
     return -1
 
 
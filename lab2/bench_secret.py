@@ -0,0 +1,101 @@
+import ast
+import contextlib
+import io
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+
+from astanalysis import DEFAULT_SECRET_RULES, SecretAnalyzer, SecretRules, do_secret
+
+# Matching string constants against many secret rules: one regex per rule vs
+# the combined SecretRules alternation. Then a scan of many files: parsing
+# every file vs the raw-bytes prefilter in do_secret.
+# Usage: python bench_secret.py [n_rules] [n_strings] [n_files]
+
+
+def make_rules(n_rules):
+    return DEFAULT_SECRET_RULES + [(f"internal{k}", rf"SVC{k:03d}_[A-Z0-9]{{20}}") for k in range(n_rules - 1)]
+
+
+def make_strings(n_strings, n_rules):
+    # Mostly ordinary strings, a few secrets of random formats
+    rng = random.Random(0)
+    words = ["hello", "config.yaml", "SELECT * FROM t", "utf-8", "SVC", "WOWSECRET_"]
+    out = []
+    for i in range(n_strings):
+        if i % 50 == 0:
+            k = rng.randrange(n_rules - 1)
+            out.append(f"SVC{k:03d}_" + "".join(rng.choice("ABC123") for _ in range(20)))
+        elif i % 50 == 1:
+            out.append(f"WOWSECRET_{rng.randint(10, 99999)}_ABCD")
+        else:
+            out.append(rng.choice(words) + str(i))
+    return out
+
+
+def write_tree(directory, n_files, lines_per_file=300):
+    # One file in 50 holds a secret
+    for i in range(n_files):
+        lines = [f"def f{k}(a, b):\n    c = a + b * {k}\n    return c" for k in range(lines_per_file // 3)]
+        if i % 50 == 0:
+            lines.append(f"api_key = \"WOWSECRET_{100 + i}_ABCD\"")
+        with open(os.path.join(directory, f"m{i}.py"), "w") as f:
+            f.write("\n".join(lines) + "\n")
+
+
+def scan(n_files):
+    with tempfile.TemporaryDirectory() as directory:
+        write_tree(directory, n_files)
+        files = sorted(os.path.join(directory, n) for n in os.listdir(directory))
+
+        start = time.perf_counter()
+        expected = []
+        for fname in files:
+            analyzer = SecretAnalyzer()
+            with open(fname) as f:
+                analyzer.visit(ast.parse(f.read()))
+            expected.extend(analyzer.messages)
+        parse_all = time.perf_counter() - start
+
+        start = time.perf_counter()
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            for fname in files:
+                do_secret(fname)
+        prefiltered = time.perf_counter() - start
+        assert out.getvalue().splitlines() == expected
+
+    print(f"{n_files} files, {len(expected)} secrets")
+    print(f"parse every file:   {parse_all:.3f}s")
+    print(f"prefilter first:    {prefiltered:.3f}s ({parse_all / prefiltered:.0f}x)")
+
+
+def main():
+    n_rules = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    n_strings = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+    rules = make_rules(n_rules)
+    strings = make_strings(n_strings, n_rules)
+
+    start = time.perf_counter()
+    separate = [(name, re.compile(pattern)) for name, pattern in rules]
+    expected = [next((name for name, regex in separate if regex.fullmatch(s)), None) for s in strings]
+    loop = time.perf_counter() - start
+
+    start = time.perf_counter()
+    combined = SecretRules(rules)
+    got = [combined.match(s) for s in strings]
+    once = time.perf_counter() - start
+    assert got == expected
+
+    print(f"{n_rules} rules, {n_strings} strings, {sum(1 for g in got if g)} secrets")
+    print(f"one regex per rule: {loop:.3f}s")
+    print(f"combined rules:     {once:.3f}s ({loop / once:.0f}x)")
+
+    scan(int(sys.argv[3]) if len(sys.argv) > 3 else 500)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+import ast
+import sys
+import time
+from collections import Counter
+
+from astanalysis import UnusedVariableChecker, symtable_unused
+
+# Unused/shadowed variables on large modules: parse + UnusedVariableChecker vs
+# the symtable path. Files given on the command line are measured too;
+# messages may differ there only where symtable_unused documents it.
+# Usage: python bench_unused.py [n_functions] [file...]
+
+
+def synthetic_source(n_funcs):
+    lines = []
+    for i in range(n_funcs):
+        lines.append(f"def f{i}(a, b):")
+        lines.append("    c = a + b")
+        lines.append("    d = [x * c for x in range(a)]")
+        lines.append(f"    unused_{i % 7} = len(d)")
+        lines.append("    class K:")
+        lines.append("        c = 1")
+        lines.append("        def m(self):")
+        lines.append("            return c")
+        lines.append("    def inner(y):")
+        lines.append("        d = y")
+        lines.append("        return lambda z: z + b")
+        lines.append("    return inner, K")
+    return "\n".join(lines) + "\n"
+
+
+def measure(label, source, fname):
+    start = time.perf_counter()
+    checker = UnusedVariableChecker()
+    checker.visit(ast.parse(source, fname))
+    visitor = time.perf_counter() - start
+
+    start = time.perf_counter()
+    print1, print2 = symtable_unused(source, fname)
+    table = time.perf_counter() - start
+
+    expected = Counter(checker.print1 + checker.print2)
+    got = Counter(print1 + print2)
+    differing = sum(((expected - got) + (got - expected)).values())
+    print(f"{label}: {len(expected)} messages, {differing} differ")
+    print(f"    parse + visitor: {visitor:.3f}s")
+    print(f"    symtable:        {table:.3f}s ({visitor / table:.1f}x)")
+    return differing
+
+
+def main():
+    n_funcs = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    differing = measure(f"{n_funcs} functions", synthetic_source(n_funcs), "<bench>")
+    assert differing == 0
+    for fname in sys.argv[2:]:
+        with open(fname, encoding="utf-8") as f:
+            measure(fname, f.read(), fname)
+
+
+if __name__ == "__main__":
+    main()
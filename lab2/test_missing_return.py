@@ -0,0 +1,194 @@
+import ast
+
+from astanalysis import FusedVisitor, MissingReturnChecker
+
+# Functions whose name starts with "bad" can fall off the end; "good" ones cannot
+SOURCE = """
+def good_plain(x):
+    return x
+
+def bad_plain(x):
+    x += 1
+
+def good_if_else(x):
+    if x:
+        return 1
+    else:
+        raise ValueError(x)
+
+def good_elif_chain(x):
+    if x == 1:
+        return 1
+    elif x == 2:
+        return 2
+    elif x == 3:
+        raise ValueError(x)
+    else:
+        return 4
+
+def bad_elif_without_else(x):
+    if x == 1:
+        return 1
+    elif x == 2:
+        return 2
+
+def good_for_else(xs):
+    for x in xs:
+        if x:
+            return x
+    else:
+        return None
+
+def bad_for_else_with_break(xs):
+    for x in xs:
+        if x:
+            break
+    else:
+        return None
+
+def good_break_then_return(xs):
+    for x in xs:
+        if x:
+            break
+    return xs
+
+def bad_loop_return_only_in_body(xs):
+    while xs:
+        return xs.pop()
+
+def good_while_true(x):
+    while True:
+        x += 1
+
+def good_while_true_inner_break(xs):
+    while True:
+        for x in xs:
+            if x:
+                break
+        xs = xs[1:]
+
+def bad_while_true_with_break(x):
+    while True:
+        if x:
+            break
+        x -= 1
+
+def good_while_true_continue(x):
+    while True:
+        if x:
+            continue
+        return x
+
+def bad_try_except_pass(x):
+    try:
+        return int(x)
+    except ValueError:
+        pass
+
+def good_try_except_return(x):
+    try:
+        return int(x)
+    except ValueError:
+        return 0
+
+def bad_try_else(x):
+    try:
+        y = int(x)
+    except ValueError:
+        return 0
+    else:
+        y += 1
+
+def good_finally_returns(x):
+    try:
+        x += 1
+    finally:
+        return x
+
+def good_with(path):
+    with open(path) as f:
+        return f.read()
+
+def good_match_wildcard(x):
+    match x:
+        case 1:
+            return "one"
+        case _:
+            return "other"
+
+def bad_match_guarded_wildcard(x):
+    match x:
+        case 1:
+            return "one"
+        case _ if x:
+            return "other"
+
+def bad_match_without_wildcard(x):
+    match x:
+        case 1:
+            return "one"
+        case [y]:
+            return y
+
+def good_match_capture_or(x):
+    match x:
+        case 1:
+            return "one"
+        case [] | other:
+            return other
+
+async def bad_async(x):
+    async for y in x:
+        return y
+
+async def good_async_with(x):
+    async with x as y:
+        return y
+
+class K:
+    def bad_method(self):
+        pass
+
+    def good_method(self):
+        def bad_nested():
+            pass
+        return bad_nested
+"""
+
+EXPECTED = [
+    "Function bad_plain is missing a return statement",
+    "Function bad_elif_without_else is missing a return statement",
+    "Function bad_for_else_with_break is missing a return statement",
+    "Function bad_loop_return_only_in_body is missing a return statement",
+    "Function bad_while_true_with_break is missing a return statement",
+    "Function bad_try_except_pass is missing a return statement",
+    "Function bad_try_else is missing a return statement",
+    "Function bad_match_guarded_wildcard is missing a return statement",
+    "Function bad_match_without_wildcard is missing a return statement",
+    "Function bad_async is missing a return statement",
+    "Function bad_method is missing a return statement",
+]
+
+
+def test_missing_returns():
+    checker = MissingReturnChecker()
+    checker.visit(ast.parse(SOURCE))
+    # nested functions are not checked separately, so bad_nested is not reported
+    assert checker.messages == EXPECTED
+
+
+def test_fused_walk_gives_the_same_messages():
+    checker = MissingReturnChecker()
+    FusedVisitor([checker]).visit(ast.parse(SOURCE))
+    assert checker.messages == EXPECTED
+
+
+def test_long_elif_chain():
+    # 1500 elifs nest deeper than the recursion limit allows a recursive walk
+    branches = "".join(f"    elif x == {i}:\n        return {i}\n" for i in range(1, 1500))
+    source = "def f(x):\n    if x == 0:\n        return 0\n" + branches
+    checker = MissingReturnChecker()
+    checker.visit(ast.parse(source + "    else:\n        return -1\n"))
+    assert checker.messages == []
+    checker.visit(ast.parse(source))
+    assert checker.messages == ["Function f is missing a return statement"]
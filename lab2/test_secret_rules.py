@@ -0,0 +1,29 @@
+import pytest
+
+from astanalysis import SecretRules
+
+
+def test_rules_keep_their_own_flags_and_groups():
+    rules = SecretRules([("aws", r"(?i)akia[0-9a-z]{16}"),
+                         ("wow", r"WOWSECRET_\d{2,5}_[A-Z]{4}"),
+                         ("twice", r"TW_(\d)\1_X"),
+                         ("named", r"NM_(?P<d>\d)(?P=d)"),
+                         ("verbose", r"(?x) VX_ \d+  # digits")])
+    assert rules.match("AKIAabcdefghijklmnop") == "aws"
+    # The flag applies to its own rule only
+    assert rules.match("wowsecret_123_ABCD") is None
+    assert rules.match("WOWSECRET_123_ABCD") == "wow"
+    assert rules.match("TW_33_X") == "twice"
+    assert rules.match("TW_34_X") is None
+    assert rules.match("NM_11") == "named"
+    assert rules.match("VX_123") == "verbose"
+
+
+def test_from_file_reports_bad_lines(tmp_path):
+    path = tmp_path / "rules.txt"
+    path.write_text("# rules\nwow WOWSECRET_\\d+\nlonely\n")
+    with pytest.raises(ValueError, match=r"rules.txt:3: expected"):
+        SecretRules.from_file(str(path))
+    path.write_text("bad abc(\n")
+    with pytest.raises(ValueError, match=r"rules.txt:1: bad pattern for rule bad"):
+        SecretRules.from_file(str(path))
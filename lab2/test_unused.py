@@ -0,0 +1,66 @@
+import ast
+
+from astanalysis import FusedVisitor, MissingReturnChecker, SecretAnalyzer, UnusedVariableChecker
+
+SOURCE = """
+import functools
+
+def outer(a, b=None):
+    x = 0
+    x += 1
+    seen = 1
+
+    @functools.wraps(seen)
+    def inner(c=seen):
+        seen = c
+        return [n for n in range(a) if (hit := n)]
+
+    class K:
+        kept = 1
+        def m(self):
+            kept = 2
+            return self
+
+    return inner, K
+"""
+
+EXPECTED = [
+    "Variable seen is defined but not used in scope inner",
+    "Variable hit is defined but not used in scope inner",
+    "Variable kept is defined but not used in scope m",
+    "Variable x is defined but not used in scope outer",
+    "Variable seen is shadowed across scopes",
+]
+
+
+def messages(checker):
+    return checker.print1 + checker.print2
+
+
+def test_scopes():
+    checker = UnusedVariableChecker()
+    checker.visit(ast.parse(SOURCE))
+    # x += 1 is a store, not a read; the decorator and default read outer's
+    # seen; the walrus target belongs to inner, not the comprehension; the
+    # class body's kept is invisible to m, so m's kept does not shadow it
+    assert messages(checker) == EXPECTED
+
+
+def test_fused_walk_gives_the_same_messages():
+    checker = UnusedVariableChecker()
+    FusedVisitor([SecretAnalyzer(), checker, MissingReturnChecker()]).visit(ast.parse(SOURCE))
+    assert messages(checker) == EXPECTED
+
+
+def test_non_module_roots():
+    tree = ast.parse(SOURCE)
+    expected = UnusedVariableChecker()
+    expected.visit(ast.Module(body=[tree.body[1]], type_ignores=[]))
+    checker = UnusedVariableChecker()
+    checker.visit(tree.body[1])
+    assert messages(checker) == messages(expected)
+    assert "Variable x is defined but not used in scope outer" in messages(checker)
+
+    checker = UnusedVariableChecker()
+    checker.visit(ast.parse("lambda a: [b for b in a if (c := b)]", mode="eval"))
+    assert messages(checker) == ["Variable c is defined but not used in scope <lambda>"]
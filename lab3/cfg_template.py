@@ -1,6 +1,7 @@
 import ast
 from typing import List, Set, Optional, Dict
 import sys
+from collections import deque
 
 # Global counter for BasicBlock IDs
 _basic_block_counter = -2
@@ -172,21 +173,21 @@ class ControlFlowGraph:
         for block in sorted(self.blocks, key=lambda b: b.id):
             if block.id not in ("Entry", "Exit"):
                 print(block)
-        print(f"Basic Block {_next_basic_block_id()}: {self.exit.id}\n\tPredecessors: {', '.join(pred.id for pred in self.exit.predecessors)}\n\tSuccessors:")
+        print(f"Basic Block BB{_basic_block_counter+1}: {self.exit.id}\n\tPredecessors: {', '.join(pred.id for pred in self.exit.predecessors)}\n\tSuccessors:")
 
     def cfg_printex2(self):
         print(f"Basic Block BB0: {self.entry.id}\n\tPredecessors:\n\tSuccessors: {', '.join(succ.id for succ in self.entry.successors)}")
         for block in sorted(self.blocks, key=lambda b: b.id):
             if block.id not in ("Entry", "Exit"):
                 print(block.liveness_str())
-        print(f"Basic Block {_next_basic_block_id()}: {self.exit.id}\n\tPredecessors: {', '.join(pred.id for pred in self.exit.predecessors)}\n\tSuccessors:")
+        print(f"Basic Block BB{_basic_block_counter+1}: {self.exit.id}\n\tPredecessors: {', '.join(pred.id for pred in self.exit.predecessors)}\n\tSuccessors:")
 
     def cfg_printex3(self):
         print(f"Basic Block BB0: {self.entry.id}\n\tPredecessors:\n\tSuccessors: {', '.join(succ.id for succ in self.entry.successors)}")
         for block in sorted(self.blocks, key=lambda b: b.id):
             if block.id not in ("Entry", "Exit"):
                 print(block.reaching_definitions_str())
-        print(f"Basic Block {_next_basic_block_id()}: {self.exit.id}\n\tPredecessors: {', '.join(pred.id for pred in self.exit.predecessors)}\n\tSuccessors:")
+        print(f"Basic Block BB{_basic_block_counter+1}: {self.exit.id}\n\tPredecessors: {', '.join(pred.id for pred in self.exit.predecessors)}\n\tSuccessors:")
 
 class Builder(ast.NodeVisitor):
     def __init__(self, cfg: ControlFlowGraph):
@@ -461,36 +462,39 @@ def make_queue(cfg: ControlFlowGraph):
         bb.in_set = set()
         bb.out_set = set()
 
-    #create a queue to add all bbs to
-    bb_queue = []
-    bb_queue.append(cfg.entry)
+    #create a queue to add all bbs to, exit first since liveness flows backward
+    bb_queue = deque()
+    bb_queue.append(cfg.exit)
 
     for bb in cfg.blocks:
-        bb_queue.append(bb)
+        if bb is not cfg.entry and bb is not cfg.exit:
+            bb_queue.append(bb)
 
-    bb_queue.append(cfg.exit)
+    bb_queue.append(cfg.entry)
+    queued = set(bb_queue)
 
     ##update in and out sets
     while bb_queue:
         #Pull a node from the head of the queue
-        bb = bb_queue.pop(0)
+        bb = bb_queue.popleft()
+        queued.discard(bb)
 
-        old_in = bb.in_set.copy()
-        old_out = bb.out_set.copy()
+        old_in = bb.in_set
 
         #update in and out sets
 
         if bb.successors:
             new_out = set()
             for successor in bb.successors:
-                new_out = new_out | successor.in_set
-            bb.out_set= new_out
+                new_out |= successor.in_set
+            bb.out_set = new_out
 
         bb.in_set = bb.use_set | (bb.out_set - bb.def_set)
 
         if bb.in_set != old_in:
             for predecessor in bb.predecessors:
-                if predecessor not in bb_queue:
+                if predecessor not in queued:
+                    queued.add(predecessor)
                     bb_queue.append(predecessor)
                     
 def reaching_definition(cfg: ControlFlowGraph):
@@ -544,35 +548,57 @@ def main():
         return do_liveness(sys.argv[2])
     elif len(sys.argv) == 3 and sys.argv[1] == "reaching":
         return do_reaching(sys.argv[2])
+    elif len(sys.argv) == 3 and sys.argv[1] == "all":
+        return do_all(sys.argv[2])
     else:
         print("Usage: python cfg.py <cmd> <file>")
         return -1
     
+class AnalysisSession:
+    """Parses a file once and builds its CFG once; every command run through the session shares them."""
+    def __init__(self, fname):
+        self.fname = fname
+        self._tree = None
+        self._cfg = None
+
+    @property
+    def tree(self):
+        if self._tree is None:
+            with open(self.fname) as f:
+                self._tree = ast.parse(f.read(), filename=self.fname)
+        return self._tree
+
+    @property
+    def cfg(self):
+        if self._cfg is None:
+            self._cfg = make_cfg(self.tree)
+        return self._cfg
+
 # Exercise 1
-def do_CFG(fname):
-    tree = ast.parse(open(fname).read(), filename=fname)
-    # print(ast.dump(tree, indent=4))
-    my_cfg = make_cfg(tree)
-    my_cfg.cfg_print()
-    # print("CFG not implemented")
+def do_CFG(fname, session=None):
+    session = session or AnalysisSession(fname)
+    session.cfg.cfg_print()
     return -1
 
 # Exercise 2
-def do_liveness(fname):
-    tree = ast.parse(open(fname).read(), filename=fname)
-    my_cfg = make_cfg(tree)
-    make_queue(my_cfg)
-    my_cfg.cfg_printex2()
-    #print("LIVENESS not implemented")
+def do_liveness(fname, session=None):
+    session = session or AnalysisSession(fname)
+    make_queue(session.cfg)
+    session.cfg.cfg_printex2()
     return -1
 
 # Exercise 3
-def do_reaching(fname):
-    tree = ast.parse(open(fname).read(), filename=fname)
-    my_cfg = make_cfg(tree)
-    reaching_definition(my_cfg)
-    my_cfg.cfg_printex3()
-    #print("REACHING not implemented")
+def do_reaching(fname, session=None):
+    session = session or AnalysisSession(fname)
+    reaching_definition(session.cfg)
+    session.cfg.cfg_printex3()
+    return -1
+
+def do_all(fname):
+    # One parse and one CFG for every command
+    session = AnalysisSession(fname)
+    for cmd in (do_CFG, do_liveness, do_reaching):
+        cmd(fname, session)
     return -1
 
 
@@ -0,0 +1,63 @@
+import ast
+import contextlib
+import io
+import sys
+import time
+
+from cfgbugs_template import CHECKERS, DEFAULT_CHECKERS, AnalysisSession, IncrementalSession
+
+# Re-analysis latency after editing one function: whole file vs IncrementalSession.
+# Usage: python bench_incremental.py [n_functions]   (10 lines per function)
+
+
+def synthetic_source(n_funcs, edited=None):
+    lines = []
+    for i in range(n_funcs):
+        lines.append(f"def f{i}(a, b):")
+        lines.append("    x = source()")
+        lines.append("    y = a + b")
+        lines.append(f"    if y > {i if i != edited else i + 1}:")
+        lines.append("        z = x")
+        lines.append("        sink(z)")
+        lines.append("    while b > 0:")
+        lines.append("        b -= 1")
+        lines.append("    y = 0")
+        lines.append("    return a")
+    return "\n".join(lines) + "\n"
+
+
+def whole_file(source):
+    session = AnalysisSession("<bench>", tree=ast.parse(source))
+    with contextlib.redirect_stdout(io.StringIO()):
+        # The same checkers IncrementalSession runs
+        for name in DEFAULT_CHECKERS:
+            CHECKERS[name]("<bench>", session)
+
+
+def main():
+    n_funcs = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    before = synthetic_source(n_funcs)
+    after = synthetic_source(n_funcs, edited=n_funcs // 2)
+
+    start = time.perf_counter()
+    whole_file(after)
+    full = time.perf_counter() - start
+
+    session = IncrementalSession()
+    start = time.perf_counter()
+    session.update(before)
+    cold = time.perf_counter() - start
+
+    session.rebuilt = 0
+    start = time.perf_counter()
+    session.update(after)
+    warm = time.perf_counter() - start
+
+    print(f"{n_funcs} functions, {after.count(chr(10))} lines")
+    print(f"whole file:          {full * 1000:8.1f} ms")
+    print(f"incremental, cold:   {cold * 1000:8.1f} ms")
+    print(f"incremental, 1 edit: {warm * 1000:8.1f} ms ({session.rebuilt} function rebuilt)")
+
+
+if __name__ == "__main__":
+    main()
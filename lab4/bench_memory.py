@@ -0,0 +1,58 @@
+import ast
+import gc
+import os
+import sys
+import sysconfig
+import tracemalloc
+
+from compact_cfg import CompactCFG
+from fixed_cfg import make_cfg_manager
+
+# Helpers shared by the labs live in labtools/ at the top of the repo
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from labtools.files import collect_files
+
+# Resident memory of object CFGs vs CompactCFGs, measured with tracemalloc.
+# Usage: python bench_memory.py [file|dir|glob ...]   (default: the stdlib)
+
+
+def load_trees(files):
+    # Keep only modules the CFG builder can handle (it supports a subset of Python)
+    trees = []
+    for fname in files:
+        try:
+            with open(fname, encoding="utf-8") as f:
+                tree = ast.parse(f.read(), filename=fname)
+            make_cfg_manager(tree)
+        except Exception:
+            continue
+        trees.append(tree)
+    return trees
+
+
+def resident(build, trees):
+    gc.collect()
+    tracemalloc.start()
+    kept = [build(tree) for tree in trees]
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    return size
+
+
+def main():
+    paths = sys.argv[1:] or [sysconfig.get_paths()["stdlib"]]
+    trees = load_trees(collect_files(paths))
+    print(f"{len(trees)} modules")
+
+    objects = resident(make_cfg_manager, trees)
+    compact = resident(lambda tree: CompactCFG.from_cfg(make_cfg_manager(tree)), trees)
+
+    print(f"object CFGs:  {objects / 1024:10.1f} KiB")
+    print(f"compact CFGs: {compact / 1024:10.1f} KiB")
+    print(f"reduction:    {100 * (1 - compact / objects):9.1f}%")
+
+
+if __name__ == "__main__":
+    main()
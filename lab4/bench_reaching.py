@@ -0,0 +1,64 @@
+import ast
+import sys
+import time
+
+from dataflow import Interner, reaching_masks
+from fixed_cfg import make_cfg_manager
+
+# Benchmark for reaching definitions on synthetic functions.
+# Usage: python bench_reaching.py [max_assignments]
+
+
+def synthetic_source(n_assign, n_vars=50, block_every=4):
+    # Straight-line assignments over a small pool of variables, split into
+    # basic blocks by an `if` every few statements so kill sets overlap heavily
+    lines = []
+    for i in range(n_assign):
+        if i and i % block_every == 0:
+            lines.append(f"if v{i % n_vars} > 0:")
+            lines.append(f"    v{(i + 1) % n_vars} = {i}")
+        lines.append(f"v{i % n_vars} = v{(i + 7) % n_vars} + {i}")
+    return "\n".join(lines) + "\n"
+
+
+def quadratic_kill(cfg):
+    # The per-block scan over every other block that reaching_definition used to do
+    definitions = Interner()
+    kill = {}
+    for bb in cfg.blocks:
+        temp = {var for stmt in bb.statements for var in stmt.def_set}
+        k = 0
+        for other_bb in cfg.blocks:
+            if other_bb is not bb:
+                for stmt in other_bb.statements:
+                    for var in stmt.def_set:
+                        if var in temp:
+                            k |= 1 << definitions.intern((var, other_bb.id))
+        kill[bb] = k
+    return kill
+
+
+def main():
+    limit = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    print(f"{'assigns':>8} {'blocks':>7} {'quadratic kill':>15} {'indexed solve':>14}")
+    n = 1000
+    while n <= limit:
+        cfg = make_cfg_manager(ast.parse(synthetic_source(n)))
+
+        if n <= 10000:
+            start = time.perf_counter()
+            quadratic_kill(cfg)
+            old = f"{time.perf_counter() - start:.3f}s"
+        else:
+            old = "skipped"
+
+        start = time.perf_counter()
+        reaching_masks(cfg)
+        new = time.perf_counter() - start
+
+        print(f"{n:>8} {len(cfg.blocks):>7} {old:>15} {new:>13.3f}s")
+        n *= 10
+
+
+if __name__ == "__main__":
+    main()
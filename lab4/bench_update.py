@@ -0,0 +1,106 @@
+import ast
+import random
+import sys
+import time
+
+from bench_reaching import synthetic_source
+from cfgbugs_template import _remove_empty_blocks, make_cfg
+from dataflow import incremental_liveness, liveness_masks
+
+# Incremental liveness updates after CFG edits vs a full re-solve. Every
+# update is checked against liveness_masks on the edited graph.
+# Usage: python bench_update.py [n_assignments]
+
+
+def nested_source(n_assign, n_vars=50):
+    # synthetic_source plus a nested if every few statements, whose inner
+    # join leaves an empty connector block behind
+    lines = synthetic_source(n_assign, n_vars).splitlines()
+    out = []
+    for i, line in enumerate(lines):
+        out.append(line)
+        if i % 8 == 7 and not line.startswith(" "):
+            out.append(f"if v{i % n_vars} > 1:")
+            out.append(f"    if v{(i + 3) % n_vars} > 2:")
+            out.append(f"        v{(i + 5) % n_vars} = {i}")
+    return "\n".join(out) + "\n"
+
+
+def full(cfg):
+    start = time.perf_counter()
+    variables, live_in, _ = liveness_masks(cfg)
+    elapsed = time.perf_counter() - start
+    return elapsed, {bb: variables.decode(m) for bb, m in live_in.items()}
+
+
+def check(variables, solution, expected):
+    got = {bb: variables.decode(m) for bb, m in solution.ins.items()}
+    assert got == expected, "incremental result differs from a full solve"
+
+
+def timed_update(solution, changed, monotone=False):
+    start = time.perf_counter()
+    queued = solution.update(changed, monotone=monotone)
+    return time.perf_counter() - start, queued
+
+
+def report(what, t_full, t_update, queued, n):
+    print(f"{what:<26} full {t_full * 1000:7.1f} ms   update {t_update * 1000:7.1f} ms   ({queued}/{n} blocks queued)")
+
+
+def random_edits(n_assign, rounds):
+    # Remove and add random edges on a small graph, checking every update
+    rng = random.Random(0)
+    cfg = make_cfg(ast.parse(nested_source(n_assign)))
+    variables, solution = incremental_liveness(cfg)
+    blocks = sorted(cfg.blocks, key=lambda b: b.number)
+    for _ in range(rounds):
+        a, b = rng.choice(blocks), rng.choice(blocks)
+        if b in a.successors:
+            a.successors.discard(b)
+            b.predecessors.discard(a)
+            solution.update([a, b])
+        else:
+            cfg.add_edge(a, b)
+            solution.update([a, b], monotone=True)
+        check(variables, solution, full(cfg)[1])
+    print(f"{rounds} random edge edits on {len(blocks)} blocks: all match a full solve")
+
+
+def main():
+    n_assign = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    # make_cfg keeps the empty connector blocks that make_cfg_manager removes
+    cfg = make_cfg(ast.parse(nested_source(n_assign)))
+    variables, solution = incremental_liveness(cfg)
+    print(f"{n_assign} assignments, {len(cfg.blocks)} blocks")
+
+    # Simplification pass: splice out empty connector blocks
+    n = len(cfg.blocks)
+    start = time.perf_counter()
+    _remove_empty_blocks(cfg, solution)
+    t_update = time.perf_counter() - start
+    t_full, expected = full(cfg)
+    check(variables, solution, expected)
+    report(f"splice {n - len(cfg.blocks)} empty blocks", t_full, t_update, n - len(cfg.blocks), len(cfg.blocks))
+
+    # What-if: drop an edge into the exit block, then restore it
+    exit_block = cfg.exit
+    last = next(iter(exit_block.predecessors))
+    last.successors.discard(exit_block)
+    exit_block.predecessors.discard(last)
+    t_update, queued = timed_update(solution, [last, exit_block])
+    t_full, expected = full(cfg)
+    check(variables, solution, expected)
+    report("remove an exit edge", t_full, t_update, queued, len(cfg.blocks))
+
+    cfg.add_edge(last, exit_block)
+    t_update, queued = timed_update(solution, [last, exit_block], monotone=True)
+    t_full, expected = full(cfg)
+    check(variables, solution, expected)
+    report("restore it", t_full, t_update, queued, len(cfg.blocks))
+
+    random_edits(200, 300)
+
+
+if __name__ == "__main__":
+    main()
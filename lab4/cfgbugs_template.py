@@ -1,14 +1,20 @@
 import ast
 from typing import List, Set, Optional, Dict
 import sys
+import os
+import io
+import contextlib
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
 
-# Global counter for BasicBlock IDs
-_basic_block_counter = -1
+from dataflow import (Interner, StatementView, liveness_masks, reachable, reaching_masks,
+                      reverse_post_order_indexed, solve_indexed)
+from compact_cfg import CompactCFG, liveness
+# Helpers shared by the labs live in labtools/ at the top of the repo
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from labtools.files import collect_files
+from labtools.result_cache import ResultCache, source_version
 
-def _next_basic_block_id():
-    global _basic_block_counter
-    _basic_block_counter += 1
-    return f"BB{_basic_block_counter}"
 
 class StatementType:
     ASSIGNMENT = "assignment"
@@ -28,8 +34,10 @@ class Statement:
         self.ast_node: ast.AST = ast_node
 
 class BasicBlock:
-    def __init__(self):
-        self.id: str = _next_basic_block_id()
+    def __init__(self, number: int):
+        # number comes from the owning ControlFlowGraph's allocator
+        self.number: int = number
+        self.id: str = f"BB{number}"
         self.statements: List[Statement] = []
         self.def_set: Set[str] = set()
         self.use_set: Set[str] = set()
@@ -51,7 +59,7 @@ class BasicBlock:
         #     return f"Basic Block BB0: {self.id}\n\tPredecessors:\n\tSuccessors: {', '.join(succ.id for succ in self.successors)}"
         # if self.id == "Exit":
         #     return ""
-        #     return f"Basic Block {_next_basic_block_id()}: {self.id}"
+        #     return f"Basic Block BB{self.number}: {self.id}"
         
         block_lines = [f"Basic Block {self.id}:"]
         #block_lines.append(f"\tStatements:")
@@ -68,7 +76,7 @@ class BasicBlock:
             if block.id == "Entry":
                 return "BB0"
             elif block.id == "Exit":
-                return f"BB{_basic_block_counter}"
+                return f"BB{block.number}"
             else:
                 return block.id
 
@@ -112,7 +120,7 @@ class BasicBlock:
             if block.id == "Entry":
                 return "BB0"
             elif block.id == "Exit":
-                return f"BB{_basic_block_counter}"
+                return f"BB{block.number}"
             else:
                 return block.id
 
@@ -125,7 +133,7 @@ class BasicBlock:
         if self.id == "Entry":
             block_lines = [f"Basic Block BB0: {self.id}"]
         elif self.id == "Exit":
-            block_lines = [f"Basic Block BB{_basic_block_counter}: {self.id}"] 
+            block_lines = [f"Basic Block BB{self.number}: {self.id}"] 
         else:
             block_lines = [f"Basic Block {self.id}:"]
             block_lines.append(f"\tStatements:")
@@ -138,7 +146,7 @@ class BasicBlock:
             if block.id == "Entry":
                 return "BB0"
             elif block.id == "Exit":
-                return f"BB{_basic_block_counter}" 
+                return f"BB{block.number}" 
             else:
                 return block.id
 
@@ -148,13 +156,13 @@ class BasicBlock:
         return "\n".join(block_lines)
 
 class EntryBlock(BasicBlock):
-    def __init__(self):
-        super().__init__()
+    def __init__(self, number: int):
+        super().__init__(number)
         self.id = "Entry"
 
 class ExitBlock(BasicBlock):
-    def __init__(self):
-        super().__init__() 
+    def __init__(self, number: int):
+        super().__init__(number)
         self.id = "Exit"
 
 class ControlFlowGraph:
@@ -162,6 +170,12 @@ class ControlFlowGraph:
         self.blocks: Set[BasicBlock] = set()
         self.entry: EntryBlock = None
         self.exit: ExitBlock = None
+        # Block numbers are allocated per graph so construction is reentrant
+        self._block_counter: int = -1
+
+    def next_block_number(self) -> int:
+        self._block_counter += 1
+        return self._block_counter
 
     def add_block(self, block: BasicBlock):
         self.blocks.add(block)
@@ -189,18 +203,18 @@ class ControlFlowGraph:
             print(block)
 
     def cfg_printex2(self):
-        print(f"Basic Block BB0: {self.entry.id}\n\tPredecessors:\n\tSuccessors: {', '.join(succ.id for succ in self.entry.successors)}")
+        print(f"Basic Block BB0: {self.entry.id}\n\tPredecessors:\n\tSuccessors: {', '.join(sorted(succ.id for succ in self.entry.successors))}")
         for block in sorted(self.blocks, key=lambda b: b.id):
             if block.id not in ("Entry", "Exit"):
                 print(block.liveness_str())
-        print(f"Basic Block BB{_basic_block_counter}: {self.exit.id}\n\tPredecessors: {', '.join(pred.id for pred in self.exit.predecessors)}\n\tSuccessors:")
+        print(f"Basic Block BB{self.exit.number}: {self.exit.id}\n\tPredecessors: {', '.join(sorted(pred.id for pred in self.exit.predecessors))}\n\tSuccessors:")
 
     def cfg_printex3(self):
-        print(f"Basic Block BB0: {self.entry.id}\n\tPredecessors:\n\tSuccessors: {', '.join(succ.id for succ in self.entry.successors)}")
+        print(f"Basic Block BB0: {self.entry.id}\n\tPredecessors:\n\tSuccessors: {', '.join(sorted(succ.id for succ in self.entry.successors))}")
         for block in sorted(self.blocks, key=lambda b: b.id):
             if block.id not in ("Entry", "Exit"):
                 print(block.reaching_definitions_str())
-        print(f"Basic Block BB{_basic_block_counter}: {self.exit.id}\n\tPredecessors: {', '.join(pred.id for pred in self.exit.predecessors)}\n\tSuccessors:")
+        print(f"Basic Block BB{self.exit.number}: {self.exit.id}\n\tPredecessors: {', '.join(sorted(pred.id for pred in self.exit.predecessors))}\n\tSuccessors:")
 
 class Builder(ast.NodeVisitor):
     def __init__(self, cfg: ControlFlowGraph):
@@ -290,7 +304,7 @@ class Builder(ast.NodeVisitor):
         if_block = self.current_block
 
         # --- THEN branch ---
-        then_block = BasicBlock()
+        then_block = BasicBlock(self.cfg.next_block_number())
         self.cfg.add_block(then_block)
         # link current -> then_block
         if_block.successors.add(then_block)
@@ -314,7 +328,7 @@ class Builder(ast.NodeVisitor):
 
         # --- ELSE branch ---
         if node.orelse:
-            else_block = BasicBlock()
+            else_block = BasicBlock(self.cfg.next_block_number())
             self.cfg.add_block(else_block)
             # connect from the IF's original block to else_block
             if_block.successors.add(else_block)
@@ -329,7 +343,7 @@ class Builder(ast.NodeVisitor):
             else_end_block = None
 
         # --- Create a join/continuation block ---
-        join_block = BasicBlock()
+        join_block = BasicBlock(self.cfg.next_block_number())
         self.cfg.add_block(join_block)
 
         # link then_end -> join
@@ -367,7 +381,7 @@ class Builder(ast.NodeVisitor):
         if reuse_as_cond:
             cond_block = cur
         else:
-            cond_block = BasicBlock()
+            cond_block = BasicBlock(self.cfg.next_block_number())
             self.cfg.add_block(cond_block)
             # link cur -> cond_block
             cur.successors.add(cond_block)
@@ -382,7 +396,7 @@ class Builder(ast.NodeVisitor):
         ))
 
         # Create loop body block
-        body_block = BasicBlock()
+        body_block = BasicBlock(self.cfg.next_block_number())
         self.cfg.add_block(body_block)
         cond_block.successors.add(body_block)
         body_block.predecessors.add(cond_block)
@@ -398,7 +412,7 @@ class Builder(ast.NodeVisitor):
             cond_block.predecessors.add(self.current_block)
 
         # Create exit block (false branch)
-        exit_block = BasicBlock()
+        exit_block = BasicBlock(self.cfg.next_block_number())
         self.cfg.add_block(exit_block)
         cond_block.successors.add(exit_block)
         exit_block.predecessors.add(cond_block)
@@ -408,14 +422,16 @@ class Builder(ast.NodeVisitor):
 
 
 
-def make_cfg(ast_node: ast.AST) -> ControlFlowGraph:
+def make_cfg(ast_node: ast.AST, cfg: Optional[ControlFlowGraph] = None) -> ControlFlowGraph:
     """
     Constructs a Control Flow Graph (CFG) from the given AST node (tree or subtree).
+    Blocks are added to (and numbered by) cfg if given, otherwise a new graph.
     Returns a ControlFlowGraph instance representing the CFG.
     """
-    cfg = ControlFlowGraph()
+    if cfg is None:
+        cfg = ControlFlowGraph()
     # entry block
-    cfg.entry = BasicBlock()
+    cfg.entry = BasicBlock(cfg.next_block_number())
     cfg.add_block(cfg.entry)
 
     builder = Builder(cfg)
@@ -434,10 +450,14 @@ def make_cfg(ast_node: ast.AST) -> ControlFlowGraph:
     return cfg
 
 
-def _remove_empty_blocks(cfg: ControlFlowGraph):
+def _remove_empty_blocks(cfg: ControlFlowGraph, solution=None):
+    # An empty block passes every fact through unchanged, so splicing it out
+    # keeps any existing fixpoint valid and solution (an IncrementalSolution)
+    # only needs the spliced blocks' neighbours re-queued
     remove_list = []
     for bb in list(cfg.blocks):
-        if bb.id in ("Entry", "Exit"):
+        # the inner exit is spliced out by make_cfg_manager, which needs its preds
+        if bb.id in ("Entry", "Exit") or bb is cfg.exit:
             continue
         if not bb.statements:
             remove_list.append(bb)
@@ -461,14 +481,20 @@ def _remove_empty_blocks(cfg: ControlFlowGraph):
         if bb in cfg.blocks:
             cfg.blocks.remove(bb)
 
+    if solution is not None and remove_list:
+        removed = set(remove_list)
+        touched = {n for bb in remove_list for n in (*bb.predecessors, *bb.successors)}
+        solution.update(touched | removed, monotone=True)
+
 def make_cfg_manager(ast_node: ast.AST) -> ControlFlowGraph:
     """
     Constructs a Control Flow Graph (CFG) using a manager from the given AST node (tree or subtree).
     Returns a ControlFlowGraph instance representing the CFG.
     """
-    entry = EntryBlock()
+    cfg = ControlFlowGraph()
+    entry = EntryBlock(cfg.next_block_number())
     
-    cfg = make_cfg(ast_node)
+    make_cfg(ast_node, cfg)
 
     # Remove empty connector blocks 
     _remove_empty_blocks(cfg)
@@ -476,7 +502,7 @@ def make_cfg_manager(ast_node: ast.AST) -> ControlFlowGraph:
     inner_exit_block = cfg.exit
     
     if not inner_exit_block.statements:
-        final_exit = ExitBlock()
+        final_exit = ExitBlock(cfg.next_block_number())
         
         for pred_block in list(inner_exit_block.predecessors):
             if inner_exit_block in pred_block.successors:
@@ -488,7 +514,7 @@ def make_cfg_manager(ast_node: ast.AST) -> ControlFlowGraph:
             cfg.blocks.remove(inner_exit_block)
             
     else:
-        final_exit = ExitBlock()
+        final_exit = ExitBlock(cfg.next_block_number())
         
         cfg.add_edge(inner_exit_block, final_exit)
 
@@ -503,86 +529,20 @@ def make_cfg_manager(ast_node: ast.AST) -> ControlFlowGraph:
 
 
 def make_queue(cfg: ControlFlowGraph):
-    #create in and out set for each bb
-    for bb in cfg.blocks:
-        bb.in_set = set()
-        bb.out_set = set()
-
-    #create a queue to add all bbs to
-    bb_queue = []
-    bb_queue.append(cfg.entry)
-
+    # solve liveness on bitmasks, then expose the results as in/out sets
+    variables, live_in, live_out = liveness_masks(cfg)
     for bb in cfg.blocks:
-        bb_queue.append(bb)
-
-    bb_queue.append(cfg.exit)
-
-    ##update in and out sets
-    while bb_queue:
-        #Pull a node from the head of the queue
-        bb = bb_queue.pop(0)
-
-        old_in = bb.in_set.copy()
-        old_out = bb.out_set.copy()
-
-        #update in and out sets
-
-        if bb.successors:
-            new_out = set()
-            for successor in bb.successors:
-                new_out = new_out | successor.in_set
-            bb.out_set= new_out
-
-        bb.in_set = bb.use_set | (bb.out_set - bb.def_set)
-
-        if bb.in_set != old_in:
-            for predecessor in bb.predecessors:
-                if predecessor not in bb_queue:
-                    bb_queue.append(predecessor)
+        bb.in_set = variables.decode(live_in[bb])
+        bb.out_set = variables.decode(live_out[bb])
 
 def reaching_definition(cfg: ControlFlowGraph):
-    #create in and out set for each bb
+    # solve reaching definitions on bitmasks, then expose gen/kill/in/out sets
+    definitions, gen, kill, rd_in, rd_out = reaching_masks(cfg)
     for bb in cfg.blocks:
-        #initialize in, out, gen, kill sets
-        bb.in_rd = set()
-        bb.out_rd = set()
-        bb.gen_set = set()
-        bb.kill_set = set()
-        temp = set()
-
-    # compute gen and kill sets
-        for stmt in bb.statements:
-            for var in stmt.def_set:
-                bb.gen_set.add((var, bb.id))
-                temp.add(var)
-        
-        for other_bb in cfg.blocks:
-            if other_bb is not bb:
-                for stmt in other_bb.statements:
-                    for var in stmt.def_set:
-                        if var in temp:
-                            bb.kill_set.add((var, other_bb.id))
-
-    # iterative computation of in and out sets
-    changed = True
-    while changed:
-        changed = False
-        for bb in cfg.blocks:
-            old_in = bb.in_rd.copy()
-            old_out = bb.out_rd.copy()
-
-            # update in set
-            new_in = set()
-            for pred in bb.predecessors:
-                new_in = new_in | pred.out_rd
-            bb.in_rd = new_in
-
-            # update out set
-            bb.out_rd = bb.gen_set | (bb.in_rd - bb.kill_set)
-
-            # check if changed
-            if bb.in_rd != old_in or bb.out_rd != old_out:
-                changed = True
+        bb.gen_set = definitions.decode(gen[bb])
+        bb.kill_set = definitions.decode(kill[bb])
+        bb.in_rd = definitions.decode(rd_in[bb])
+        bb.out_rd = definitions.decode(rd_out[bb])
 
 def get_uses(node):
     if node is None:
@@ -638,46 +598,15 @@ def get_uses(node):
     return set(uses)
 
 def missing_return(cfg: ControlFlowGraph):
-    for block in cfg.blocks:
-        for stmt in block.statements:
-            if stmt.stmt_type == StatementType.RETURN:
-                block.successors.discard(cfg.exit)
-                cfg.exit.predecessors.discard(block)
-    
-    all_cfg_blocks = []
-    all_cfg_blocks.append(cfg.entry)
-    for block in cfg.blocks:
-        all_cfg_blocks.append(block)
-    all_cfg_blocks.append(cfg.exit)
-
-    for block in all_cfg_blocks:
-        block.in_set = set()
-        block.out_set = set()
-
-    all_cfg_blocks[0].in_set = {True}
-    
-    changed = True
-    while changed:
-        changed = False
-        for bb in all_cfg_blocks:
-            old_in = bb.in_set.copy()
-            old_out = bb.out_set.copy()
-
-            # update in set
-            new_in = set()
-            for pred in bb.predecessors:
-                new_in = new_in | pred.out_set
-            bb.in_set = new_in
-
-            # update out set
-            bb.out_set = bb.in_set
-
-            # check if changed
-            if bb.in_set != old_in or bb.out_set != old_out:
-                changed = True
-    
-    for bb in cfg.blocks:
-        if cfg.exit in bb.successors:
+    # Blocks containing a return never fall through to exit. They are skipped
+    # rather than cut off from exit so the CFG can be shared with other checkers.
+    def returns(block):
+        return any(stmt.stmt_type == StatementType.RETURN for stmt in block.statements)
+
+    # only blocks reachable from entry can fall through to exit
+    live_blocks = reachable(cfg)
+    for bb in sorted(cfg.blocks, key=lambda b: b.id):
+        if bb in live_blocks and cfg.exit in bb.successors and not returns(bb):
             print(f"{bb.id}: there exists a path to exit without return")
 
 def taint_analysis_statement(statement: Statement, in_set: Set[str], out_set: Set[str]):
@@ -697,175 +626,46 @@ def taint_analysis_statement(statement: Statement, in_set: Set[str], out_set: Se
             out_set.add(var)
 
 
-def generate_statement_worklist(cfg: ControlFlowGraph):
-    worklist = []
-    block_id = 1
-    
-    # Map to track which worklist items belong to which original block
-    # Format: {original_block_id: [(statement_index, worklist_index), ...]}
-    block_to_worklist = {}
-    
-    # First pass: create worklist items for each statement
-    for each_block in sorted(cfg.blocks, key=lambda b: b.id):
-        if each_block.id == "Entry" or each_block.id == "Exit":
-            continue
-            
-        block_statements = []
-        
-        for stmt_idx, stmt in enumerate(each_block.statements):
-            # Check if this is an assignment from source()
-            is_source_assignment = False
-            if stmt.stmt_type == StatementType.ASSIGNMENT and stmt.ast_node:
-                # Check if the right-hand side is a call to source()
-                if isinstance(stmt.ast_node, ast.Assign):
-                    if isinstance(stmt.ast_node.value, ast.Call):
-                        if isinstance(stmt.ast_node.value.func, ast.Name) and stmt.ast_node.value.func.id == "source":
-                            is_source_assignment = True
-            
-            worklist_item = {
-                'block_id': f'BB{block_id}',
-                'statement': stmt.stmt_type,
-                'original_block_id': each_block.id,
-                'stmt_index': stmt_idx,
-                'def_set': stmt.def_set.copy(),
-                'use_set': stmt.use_set.copy(),
-                'is_source_assignment': is_source_assignment,
-                'in_set': set(),
-                'out_set': set(),
-                'predecessors': set(),
-                'successors': set()
-            }
-            worklist.append(worklist_item)
-            block_statements.append((stmt_idx, len(worklist) - 1))
-            block_id += 1
-        
-        block_to_worklist[each_block.id] = block_statements
-    
-    # Second pass: set up predecessors and successors
-    for each_block in cfg.blocks:
-        if each_block.id == "Entry" or each_block.id == "Exit":
-            continue
-        
-        if each_block.id not in block_to_worklist or not block_to_worklist[each_block.id]:
-            continue
-        
-        block_worklist_items = block_to_worklist[each_block.id]
-        num_stmts = len(block_worklist_items)
-        
-        for i, (stmt_idx, worklist_idx) in enumerate(block_worklist_items):
-            current_item = worklist[worklist_idx]
-            
-            # Set predecessors
-            if i == 0:
-                # First statement: predecessors are the last statements of predecessor blocks
-                for pred_block in each_block.predecessors:
-                    if pred_block.id == "Entry":
-                        # If predecessor is Entry, this is the first statement of the CFG
-                        # Add Entry as a special predecessor (or skip if you want)
-                        continue
-                    elif pred_block.id in block_to_worklist and block_to_worklist[pred_block.id]:
-                        # Add the last statement of the predecessor block
-                        last_stmt_worklist_idx = block_to_worklist[pred_block.id][-1][1]
-                        current_item['predecessors'].add(worklist[last_stmt_worklist_idx]['block_id'])
-            else:
-                # Middle statements: predecessor is the previous statement in the same block
-                prev_worklist_idx = block_worklist_items[i - 1][1]
-                current_item['predecessors'].add(worklist[prev_worklist_idx]['block_id'])
-            
-            # Set successors
-            if i == num_stmts - 1:
-                # Last statement: successors are the first statements of successor blocks
-                for succ_block in each_block.successors:
-                    if succ_block.id == "Exit":
-                        # If successor is Exit, this is the last statement before exit
-                        continue
-                    elif succ_block.id in block_to_worklist and block_to_worklist[succ_block.id]:
-                        # Add the first statement of the successor block
-                        first_stmt_worklist_idx = block_to_worklist[succ_block.id][0][1]
-                        current_item['successors'].add(worklist[first_stmt_worklist_idx]['block_id'])
-            else:
-                # Middle statements: successor is the next statement in the same block
-                next_worklist_idx = block_worklist_items[i + 1][1]
-                current_item['successors'].add(worklist[next_worklist_idx]['block_id'])
-    
-    return worklist
-
-def transfer_taint(block, in_set):
-    out_set = set(in_set)
-    defs = block['def_set']
-    uses = block['use_set']
-    stmt_type = block['statement']
-
-    if block.get('is_source_assignment', False):
-        out_set |= defs
-    elif stmt_type == 'assignment':
-        defined_var = next(iter(defs)) if defs else None
-        if not uses:
-            if defined_var:
-                out_set.discard(defined_var)
-        elif any(v in in_set for v in uses):
-            if defined_var:
-                out_set.add(defined_var)
-        else:
-            if defined_var:
-                out_set.discard(defined_var)
-    elif stmt_type in ('if', 'while'):
-        pass
-
-    return out_set
-
-def run_taint_analysis(worklist):
-    changed = True
-    while changed:
-        changed = False
-        for block in worklist:
-            preds = block['predecessors']
-            in_set = set().union(*(b['out_set'] for b in worklist if b['block_id'] in preds))
-            block['in_set'] = in_set
-            new_out = transfer_taint(block, in_set)
-            if new_out != block['out_set']:
-                block['out_set'] = new_out
-                changed = True
+def is_source_assignment(stmt: Statement) -> bool:
+    # x = source(...)
+    node = stmt.ast_node
+    return (stmt.stmt_type == StatementType.ASSIGNMENT and isinstance(node, ast.Assign)
+            and isinstance(node.value, ast.Call) and isinstance(node.value.func, ast.Name)
+            and node.value.func.id == "source")
+
+def transfer_taint(stmt: Statement, defs: int, uses: int, in_set: int) -> int:
+    if is_source_assignment(stmt):
+        return in_set | defs
+    if stmt.stmt_type == StatementType.ASSIGNMENT:
+        # the target is tainted exactly when one of the values it reads is
+        if uses & in_set:
+            return in_set | defs
+        return in_set & ~defs
+    return in_set
+
+def run_taint_analysis(view: StatementView):
+    variables = Interner()
+    defs = [variables.mask(sorted(stmt.def_set)) for stmt in view.statements()]
+    uses = [variables.mask(sorted(stmt.use_set)) for stmt in view.statements()]
+
+    # Only successors of a statement whose out set changed are revisited
+    order = reverse_post_order_indexed(view.succs, [p for p in range(len(view)) if not view.preds[p]])
+    in_sets, _ = solve_indexed(order, view.preds, view.succs,
+                               lambda p, in_set: transfer_taint(view.statement(p), defs[p], uses[p], in_set))
 
     # --- After convergence: check for tainted sinks ---
-    for block in worklist:
-        if block['statement'] == 'sink':
-            for v in block['use_set']:
-                if v in block['in_set']:
-                    print(f"{block['block_id']}: tainted variable {v} reaches sink")
+    for p, stmt in enumerate(view.statements()):
+        if stmt.stmt_type == StatementType.SINK:
+            for v in sorted(variables.decode(uses[p] & in_sets[p])):
+                print(f"{view.label(p)}: tainted variable {v} reaches sink")
 
 
 def taint_analysis(cfg: ControlFlowGraph):
-
-    worklist = generate_statement_worklist(cfg)
-
-    run_taint_analysis(worklist)
-    
-    # print("Initial Worklist:")
-    # for item in worklist:
-    #     print(f"\t{item}")
+    run_taint_analysis(StatementView(cfg))
 
 def dead_store(cfg: ControlFlowGraph):
-    for bb in cfg.blocks:
-        bb.in_set = set()
-        bb.out_set = set()
-
-    changed = True
-    while changed:
-        changed = False
-        for bb in cfg.blocks:
-            old_in = bb.in_set.copy()
-            old_out = bb.out_set.copy()
-
-            new_out = set()
-            for succ in bb.successors:
-                new_out |= getattr(succ, 'in_set', set())
-            bb.out_set = new_out
+    make_queue(cfg)
 
-            bb.in_set = bb.use_set | (bb.out_set - bb.def_set)
-
-            if bb.in_set != old_in or bb.out_set != old_out:
-                changed = True
     for bb in sorted(cfg.blocks, key=lambda b: getattr(b, 'id', '')):
         if bb.id in ("Entry", "Exit"):
             continue
@@ -879,51 +679,367 @@ def dead_store(cfg: ControlFlowGraph):
                     if d not in live:
                         dead_stores.add(d)
 
-            live -= set(stmt.def_set)
-            live |= set(stmt.use_set)
-        
-        for ds in dead_stores:
+            live -= stmt.def_set
+            live |= stmt.use_set
+
+        for ds in sorted(dead_stores):
             print(f"{bb.id}: variable {ds} definition is never used")
 
+def dead_store_compact(compact: CompactCFG):
+    # dead_store on the array-backed graph: the same liveness, walked on masks
+    assignment = compact.kinds.index.get(StatementType.ASSIGNMENT)
+    _, live_out = liveness(compact)
+
+    for b in sorted(range(len(compact)), key=lambda b: compact.labels[b]):
+        if compact.labels[b] in ("Entry", "Exit"):
+            continue
+
+        live = live_out[b]
+        dead_stores = 0
+
+        for s in reversed(compact.statements(b)):
+            if compact.stmt_kinds[s] == assignment:
+                dead_stores |= compact.stmt_defs[s] & ~live
+
+            live = (live & ~compact.stmt_defs[s]) | compact.stmt_uses[s]
+
+        for ds in sorted(compact.variables.decode(dead_stores)):
+            print(f"{compact.labels[b]}: variable {ds} definition is never used")
+
+def missing_return_compact(compact: CompactCFG):
+    # missing_return on the array-backed graph
+    ret = compact.kinds.index.get(StatementType.RETURN)
+    live_blocks = compact.reachable()
+    for b in sorted(range(len(compact)), key=lambda b: compact.labels[b]):
+        if (live_blocks[b] and compact.exit in compact.successors(b)
+                and all(compact.stmt_kinds[s] != ret for s in compact.statements(b))):
+            print(f"{compact.labels[b]}: there exists a path to exit without return")
+
 def main():
-    if len(sys.argv) == 3 and sys.argv[1] == "stores":
-        return do_stores(sys.argv[2])
-    elif len(sys.argv) == 3 and sys.argv[1] == "returns":
-        return do_returns(sys.argv[2])
-    elif len(sys.argv) == 3 and sys.argv[1] == "taints":
-        return do_taints(sys.argv[2])
-    else:
-        print("Usage: python cfgbugs.py <cmd> <file>")
-        return -1
+    # Set ANALYSIS_CACHE=<dir> to reuse results for unchanged files
+    here = os.path.dirname(os.path.abspath(__file__))
+    cache = ResultCache.from_env(source_version(os.path.join(here, "cfgbugs_template.py"),
+                                                os.path.join(here, "dataflow.py"),
+                                                os.path.join(here, "compact_cfg.py")))
+    try:
+        if len(sys.argv) == 3 and sys.argv[1] == "stores":
+            return run_checkers(sys.argv[2], ["stores"], cache)
+        elif len(sys.argv) == 3 and sys.argv[1] == "returns":
+            return run_checkers(sys.argv[2], ["returns"], cache)
+        elif len(sys.argv) == 3 and sys.argv[1] == "taints":
+            return run_checkers(sys.argv[2], ["taints"], cache)
+        elif len(sys.argv) == 3 and sys.argv[1] in ("stores-compact", "returns-compact"):
+            return run_checkers(sys.argv[2], [sys.argv[1]], cache)
+        elif len(sys.argv) == 3 and sys.argv[1] == "all":
+            return do_all(sys.argv[2], cache)
+        elif len(sys.argv) == 3 and sys.argv[1] == "functions":
+            return do_functions(sys.argv[2])
+        elif len(sys.argv) >= 4 and sys.argv[1] == "batch":
+            checkers = DEFAULT_CHECKERS if sys.argv[2] == "all" else sys.argv[2].split(",")
+            return do_batch(checkers, sys.argv[3:], cache=cache)
+        else:
+            print("Usage: python cfgbugs.py <cmd> <file>")
+            print("       python cfgbugs.py batch <cmd>[,<cmd>...]|all <file|dir|glob>...")
+            return -1
+    finally:
+        if cache is not None:
+            cache.report()
     
+class AnalysisSession:
+    """
+    Parses a file once and builds its CFG once; every checker run through the
+    session shares them. Checkers must not restructure the shared CFG.
+    """
+    def __init__(self, fname, tree: Optional[ast.AST] = None):
+        self.fname = fname
+        self._tree = tree
+        self._cfg = None
+        self._compact = None
+
+    @property
+    def tree(self) -> ast.AST:
+        if self._tree is None:
+            with open(self.fname) as f:
+                self._tree = ast.parse(f.read(), filename=self.fname)
+        return self._tree
+
+    @property
+    def cfg(self) -> ControlFlowGraph:
+        if self._cfg is None:
+            self._cfg = make_cfg_manager(self.tree)
+        return self._cfg
+
+    @property
+    def compact_cfg(self) -> CompactCFG:
+        if self._compact is None:
+            self._compact = CompactCFG.from_cfg(self.cfg)
+        return self._compact
+
 # Exercise 1
-def do_stores(fname):
-    tree = ast.parse(open(fname).read(), filename=fname)
-    my_cfg = make_cfg_manager(tree)
-    dead_store(my_cfg)
+def do_stores(fname, session=None):
+    session = session or AnalysisSession(fname)
+    dead_store(session.cfg)
     return -1
 
 # Exercise 2
-def do_returns(fname):
-    #print("RETURNS not implemented")
-    tree = ast.parse(open(fname).read(), filename=fname)
-    my_cfg = make_cfg_manager(tree)
-
-    missing_return(my_cfg)
+def do_returns(fname, session=None):
+    session = session or AnalysisSession(fname)
+    missing_return(session.cfg)
     return -1
 
 # Exercise 3
-def do_taints(fname):
-    # print("TAINTS not implemented")
-    tree = ast.parse(open(fname).read(), filename=fname)
-    # print(ast.dump(tree, indent=4))
-    my_cfg = make_cfg_manager(tree)
-    #my_cfg.cfg_print()
-
+def do_taints(fname, session=None):
+    session = session or AnalysisSession(fname)
     # Perform taint analysis
-    taint_analysis(my_cfg)
+    taint_analysis(session.cfg)
+    return -1
+
+# Exercises 1 and 2 on the CompactCFG; same output as stores and returns
+def do_stores_compact(fname, session=None):
+    session = session or AnalysisSession(fname)
+    dead_store_compact(session.compact_cfg)
+    return -1
+
+def do_returns_compact(fname, session=None):
+    session = session or AnalysisSession(fname)
+    missing_return_compact(session.compact_cfg)
     return -1
 
+CHECKERS = {
+    "stores": do_stores,
+    "returns": do_returns,
+    "taints": do_taints,
+    "stores-compact": do_stores_compact,
+    "returns-compact": do_returns_compact,
+}
+
+# "all" runs each check once, on the object CFG
+DEFAULT_CHECKERS = ["stores", "returns", "taints"]
+
+def do_all(fname, cache=None):
+    return run_checkers(fname, DEFAULT_CHECKERS, cache)
+
+def run_checkers(fname, names, cache=None):
+    # One parse and one CFG for every checker; with a cache, checkers whose
+    # result is stored for this exact file content are not run at all
+    session = AnalysisSession(fname)
+    content = None
+    for name in names:
+        if cache is None:
+            CHECKERS[name](fname, session)
+            continue
+        if content is None:
+            with open(fname, "rb") as f:
+                content = f.read()
+        key = cache.key(content, name)
+        output = cache.get(key, len(content))
+        if output is None:
+            out = io.StringIO()
+            with contextlib.redirect_stdout(out):
+                CHECKERS[name](fname, session)
+            output = out.getvalue()
+            cache.put(key, output)
+        sys.stdout.write(output)
+    return -1
+
+CONTINUATIONS = ("else:", "else ", "elif ", "elif(", "except", "finally:", "finally ", ")", "]", "}")
+
+def split_chunks(source: str) -> List[str]:
+    """
+    Splits source into top-level statement texts without parsing it: a chunk
+    starts at every line that begins in column 0, except decorated
+    definitions, else/elif/except/finally clauses and closing brackets.
+    """
+    chunks = []
+    current = []
+    decorated = False
+    quote = None
+    for line in source.splitlines(keepends=True):
+        first = line[:1]
+        if quote is None and first and first not in " \t\r\n#" and not line.startswith(CONTINUATIONS):
+            if current and not decorated:
+                chunks.append("".join(current))
+                current = []
+            decorated = first == "@"
+        current.append(line)
+        quote = _triple_quote_state(line, quote)
+    if current:
+        chunks.append("".join(current))
+    return chunks
+
+def _triple_quote_state(line: str, quote: Optional[str]) -> Optional[str]:
+    # The triple quote still open at the end of line, given the one open at
+    # its start. Approximate (ignores comments and escapes); a wrong guess only
+    # costs a fallback to a full parse.
+    pos = 0
+    while True:
+        if quote is None:
+            starts = [(line.find(q, pos), q) for q in ('"""', "'''")]
+            starts = [(i, q) for i, q in starts if i >= 0]
+            if not starts:
+                return None
+            pos, quote = min(starts)
+        else:
+            end = line.find(quote, pos)
+            if end < 0:
+                return quote
+            quote = None
+            pos = end
+        pos += 3
+
+def unit_key(node: ast.AST) -> str:
+    # ast.dump leaves out line numbers, so moving a function keeps its key
+    return hashlib.sha256(ast.dump(node).encode()).hexdigest()
+
+class IncrementalSession:
+    """
+    Keeps one CFG and one set of checker outputs per top-level function,
+    keyed by the function's AST hash; the remaining module-level statements
+    form one more unit, "<module>". update() only re-parses chunks of text
+    that changed and only rebuilds and re-checks units whose hash changed.
+    Block numbers are per CFG, so reused outputs stay valid wherever the
+    function moved.
+    """
+    def __init__(self, checkers=None):
+        self.checkers = list(checkers or DEFAULT_CHECKERS)
+        self.chunks: Dict[str, list] = {}
+        self.units: Dict[str, dict] = {}
+        self.rebuilt = 0
+
+    def _statements(self, source, filename):
+        # (stmt, key) for every top-level statement, in order
+        statements = []
+        chunks = {}
+        try:
+            for text in split_chunks(source):
+                parsed = chunks.get(text) or self.chunks.get(text)
+                if parsed is None:
+                    parsed = [(stmt, unit_key(stmt)) for stmt in ast.parse(text, filename=filename).body]
+                chunks[text] = parsed
+                statements.extend(parsed)
+        except SyntaxError:
+            # A chunk boundary fell inside a statement (or the file really is
+            # invalid, in which case this raises the proper error)
+            chunks = {}
+            statements = [(stmt, unit_key(stmt)) for stmt in ast.parse(source, filename=filename).body]
+        self.chunks = chunks
+        return statements
+
+    def _analyse(self, name, node):
+        session = AnalysisSession(name, tree=node)
+        outputs = {}
+        for checker in self.checkers:
+            out = io.StringIO()
+            with contextlib.redirect_stdout(out):
+                CHECKERS[checker](name, session)
+            outputs[checker] = out.getvalue()
+        self.rebuilt += 1
+        return {"session": session, "outputs": outputs}
+
+    def update(self, source: str, filename: str = "<unknown>"):
+        """Returns (unit name, checker, finding) triples for the whole file."""
+        units = []
+        module_body = []
+        module_keys = []
+        for stmt, key in self._statements(source, filename):
+            if isinstance(stmt, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                units.append((stmt.name, stmt, key))
+            else:
+                module_body.append(stmt)
+                module_keys.append(key)
+        if module_body:
+            module = ast.Module(body=module_body, type_ignores=[])
+            units.append(("<module>", module, hashlib.sha256("".join(module_keys).encode()).hexdigest()))
+
+        findings = []
+        current = {}
+        for name, node, key in units:
+            unit = current.get(key) or self.units.get(key)
+            if unit is None:
+                unit = self._analyse(name, node)
+            current[key] = unit
+            for checker in self.checkers:
+                for line in unit["outputs"][checker].splitlines():
+                    findings.append((name, checker, line))
+        # Drop units for functions that no longer exist in this version
+        self.units = current
+        return findings
+
+# Per-function analysis, as used by the editor integration
+def do_functions(fname, session=None):
+    session = session or IncrementalSession()
+    with open(fname) as f:
+        source = f.read()
+    for name, checker, line in session.update(source, fname):
+        print(f"{name}: {checker}: {line}")
+    return -1
+
+def check_file(fname, checkers):
+    # Runs in a worker process; checker output is captured so the parent can
+    # print it in a deterministic order
+    results = []
+    session = AnalysisSession(fname)
+    for name in checkers:
+        out = io.StringIO()
+        ok = True
+        try:
+            with contextlib.redirect_stdout(out):
+                CHECKERS[name](fname, session)
+        except Exception as e:
+            out.write(f"error: {type(e).__name__}: {e}\n")
+            ok = False
+        results.append((name, out.getvalue(), ok))
+    return results
+
+def do_batch(checkers, patterns, workers=None, cache=None):
+    unknown = [name for name in checkers if name not in CHECKERS]
+    if unknown:
+        print(f"Unknown checker(s): {', '.join(unknown)}; expected {', '.join(CHECKERS)}")
+        return -1
+
+    files = collect_files(patterns)
+
+    # Cache lookups happen in the parent, so only files with a miss reach the pool
+    outputs = {}
+    keys = {}
+    pending = []
+    for fname in files:
+        missing = checkers
+        if cache is not None:
+            try:
+                with open(fname, "rb") as f:
+                    content = f.read()
+            except OSError:
+                content = None
+            if content is not None:
+                missing = []
+                for name in checkers:
+                    key = cache.key(content, name)
+                    output = cache.get(key, len(content))
+                    if output is None:
+                        keys[fname, name] = key
+                        missing.append(name)
+                    else:
+                        outputs[fname, name] = output
+        if missing:
+            pending.append((fname, missing))
+
+    if pending:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # map yields results in submission order, whatever order workers finish in
+            fresh = pool.map(check_file, [f for f, _ in pending], [c for _, c in pending], chunksize=8)
+            for (fname, _), results in zip(pending, fresh):
+                for name, output, ok in results:
+                    outputs[fname, name] = output
+                    if ok and (fname, name) in keys:
+                        cache.put(keys[fname, name], output)
+
+    for fname in files:
+        for name in checkers:
+            for line in outputs[fname, name].splitlines():
+                print(f"{fname}: {name}: {line}")
+    return 0
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,113 @@
+"""
+Compact, array-backed form of a ControlFlowGraph.
+
+Blocks are numbered 0..n-1 in reverse post-order, edges live in CSR
+(offset/target) arrays, variables are interned to bit indices and analysis
+results go into per-CFG side tables rather than onto block objects. Build one
+with CompactCFG.from_cfg(cfg) and drop the object graph afterwards.
+"""
+from array import array
+from typing import Dict, List
+
+from dataflow import BACKWARD, FORWARD, Interner, reverse_post_order, solve_indexed
+
+
+class CompactCFG:
+    __slots__ = (
+        "labels", "entry", "exit", "variables", "kinds",
+        "succ_offsets", "succ_targets", "pred_offsets", "pred_targets",
+        "stmt_offsets", "stmt_kinds", "stmt_defs", "stmt_uses", "stmt_nodes",
+        "def_masks", "use_masks", "results",
+    )
+
+    def __init__(self):
+        self.labels: List[str] = []
+        self.entry: int = -1
+        self.exit: int = -1
+        self.variables = Interner()
+        self.kinds = Interner()
+        self.succ_offsets = array("i", [0])
+        self.succ_targets = array("i")
+        self.pred_offsets = array("i", [0])
+        self.pred_targets = array("i")
+        self.stmt_offsets = array("i", [0])
+        self.stmt_kinds = array("B")
+        self.stmt_defs: List[int] = []
+        self.stmt_uses: List[int] = []
+        self.stmt_nodes: list = []
+        self.def_masks: List[int] = []
+        self.use_masks: List[int] = []
+        self.results: Dict[str, list] = {}
+
+    @classmethod
+    def from_cfg(cls, cfg) -> "CompactCFG":
+        compact = cls()
+        blocks = reverse_post_order(cfg)
+        index = {bb: i for i, bb in enumerate(blocks)}
+        variables = compact.variables
+
+        compact.labels = [bb.id for bb in blocks]
+        compact.entry = index.get(cfg.entry, -1)
+        compact.exit = index.get(cfg.exit, -1)
+
+        for bb in blocks:
+            compact.succ_targets.extend(sorted(index[s] for s in bb.successors if s in index))
+            compact.succ_offsets.append(len(compact.succ_targets))
+            compact.pred_targets.extend(sorted(index[p] for p in bb.predecessors if p in index))
+            compact.pred_offsets.append(len(compact.pred_targets))
+
+            for stmt in bb.statements:
+                compact.stmt_kinds.append(compact.kinds.intern(stmt.stmt_type))
+                compact.stmt_defs.append(variables.mask(sorted(stmt.def_set)))
+                compact.stmt_uses.append(variables.mask(sorted(stmt.use_set)))
+                compact.stmt_nodes.append(stmt.ast_node)
+            compact.stmt_offsets.append(len(compact.stmt_kinds))
+
+            compact.def_masks.append(variables.mask(sorted(bb.def_set)))
+            compact.use_masks.append(variables.mask(sorted(bb.use_set)))
+
+        return compact
+
+    def __len__(self):
+        return len(self.labels)
+
+    def successors(self, b: int):
+        return self.succ_targets[self.succ_offsets[b]:self.succ_offsets[b + 1]]
+
+    def predecessors(self, b: int):
+        return self.pred_targets[self.pred_offsets[b]:self.pred_offsets[b + 1]]
+
+    def statements(self, b: int) -> range:
+        return range(self.stmt_offsets[b], self.stmt_offsets[b + 1])
+
+    def reachable(self) -> bytearray:
+        """seen[b] is 1 for every block reachable from the entry."""
+        seen = bytearray(len(self))
+        stack = [self.entry] if self.entry >= 0 else []
+        while stack:
+            b = stack.pop()
+            if not seen[b]:
+                seen[b] = 1
+                stack.extend(self.successors(b))
+        return seen
+
+    def solve(self, direction: str, transfer, **kwargs):
+        """Run dataflow.solve_indexed on this graph; returns (ins, outs) lists indexed by block."""
+        n = len(self)
+        preds = [self.predecessors(b) for b in range(n)]
+        succs = [self.successors(b) for b in range(n)]
+        # Blocks are already numbered in reverse post-order
+        if direction == FORWARD:
+            before, after = solve_indexed(list(range(n)), preds, succs, transfer, start=self.entry, **kwargs)
+            return before, after
+        before, after = solve_indexed(list(range(n - 1, -1, -1)), succs, preds, transfer, start=self.exit, **kwargs)
+        return after, before
+
+
+def liveness(compact: CompactCFG):
+    """Fill the live_in / live_out side tables (variable bitmasks per block)."""
+    use, defs = compact.use_masks, compact.def_masks
+    live_in, live_out = compact.solve(BACKWARD, lambda b, out: use[b] | (out & ~defs[b]))
+    compact.results["live_in"] = live_in
+    compact.results["live_out"] = live_out
+    return live_in, live_out
@@ -0,0 +1,469 @@
+"""
+Bit-vector dataflow core shared by fixed_cfg.py and cfgbugs_template.py.
+
+Variables and definitions are interned into dense integer indices and every
+set is stored as a Python int bitmask, so union/difference/equality are single
+big-int operations instead of set copies.
+"""
+import heapq
+import operator
+from array import array
+from typing import Callable, Dict, Hashable, Iterable, Iterator, List, Optional, Set, Tuple
+
+FORWARD = "forward"
+BACKWARD = "backward"
+
+
+class Interner:
+    """Maps hashable items (variable names, (var, block_id) pairs) to bit indices."""
+
+    def __init__(self):
+        self.index: Dict[Hashable, int] = {}
+        self.items: List[Hashable] = []
+
+    def __len__(self):
+        return len(self.items)
+
+    def intern(self, item) -> int:
+        idx = self.index.get(item)
+        if idx is None:
+            idx = len(self.items)
+            self.index[item] = idx
+            self.items.append(item)
+        return idx
+
+    def mask(self, items: Iterable) -> int:
+        m = 0
+        for item in items:
+            m |= 1 << self.intern(item)
+        return m
+
+    def decode(self, mask: int) -> Set:
+        # Walk the set bits lowest-first
+        out = set()
+        items = self.items
+        while mask:
+            low = mask & -mask
+            out.add(items[low.bit_length() - 1])
+            mask ^= low
+        return out
+
+
+class StatementView:
+    """
+    Statement-granularity view over a ControlFlowGraph, without copying it.
+
+    Blocks that hold statements are laid out in block id order and their
+    statements numbered 0..n-1 consecutively. Edges inside a block are
+    implicit (p-1 -> p); the first statement of a block follows the last
+    statement of each non-empty predecessor block. view.preds and view.succs
+    can be passed straight to solve_indexed.
+    """
+    __slots__ = ("cfg", "blocks", "offsets", "block_of", "block_index", "preds", "succs")
+
+    def __init__(self, cfg):
+        self.cfg = cfg
+        self.blocks = [bb for bb in sorted(cfg.blocks, key=lambda b: b.id)
+                       if bb.id not in ("Entry", "Exit") and bb.statements]
+        self.block_index = {bb: b for b, bb in enumerate(self.blocks)}
+        self.offsets = array("i", [0])
+        self.block_of = array("i")
+        for b, bb in enumerate(self.blocks):
+            self.block_of.extend([b] * len(bb.statements))
+            self.offsets.append(len(self.block_of))
+        self.preds = _StatementEdges(self, self.predecessors)
+        self.succs = _StatementEdges(self, self.successors)
+
+    def __len__(self):
+        return len(self.block_of)
+
+    def __iter__(self) -> Iterator[Tuple]:
+        """Yields (block, stmt_index) for every position in order."""
+        for bb in self.blocks:
+            for i in range(len(bb.statements)):
+                yield bb, i
+
+    def locate(self, p: int) -> Tuple:
+        b = self.block_of[p]
+        return self.blocks[b], p - self.offsets[b]
+
+    def statement(self, p: int):
+        b = self.block_of[p]
+        return self.blocks[b].statements[p - self.offsets[b]]
+
+    def statements(self):
+        for bb in self.blocks:
+            yield from bb.statements
+
+    def label(self, p: int) -> str:
+        return f"BB{p + 1}"
+
+    def predecessors(self, p: int) -> List[int]:
+        b = self.block_of[p]
+        if p != self.offsets[b]:
+            return [p - 1]
+        index, offsets = self.block_index, self.offsets
+        return sorted(offsets[index[pb] + 1] - 1 for pb in self.blocks[b].predecessors if pb in index)
+
+    def successors(self, p: int) -> List[int]:
+        b = self.block_of[p]
+        if p + 1 != self.offsets[b + 1]:
+            return [p + 1]
+        index, offsets = self.block_index, self.offsets
+        return sorted(offsets[index[sb]] for sb in self.blocks[b].successors if sb in index)
+
+
+class _StatementEdges:
+    """Sequence adapter: edges[p] computes the neighbours of position p on demand."""
+    __slots__ = ("view", "neighbours")
+
+    def __init__(self, view: StatementView, neighbours: Callable):
+        self.view = view
+        self.neighbours = neighbours
+
+    def __len__(self):
+        return len(self.view)
+
+    def __getitem__(self, p: int) -> List[int]:
+        return self.neighbours(p)
+
+
+def reverse_post_order(cfg) -> List:
+    """
+    Blocks of cfg in reverse post-order of a DFS from cfg.entry.
+    Blocks unreachable from the entry are appended afterwards.
+    """
+    order = []
+    visited = {cfg.entry}
+    stack = [(cfg.entry, iter(cfg.entry.successors))]
+    while stack:
+        bb, succs = stack[-1]
+        for succ in succs:
+            if succ not in visited and succ in cfg.blocks:
+                visited.add(succ)
+                stack.append((succ, iter(succ.successors)))
+                break
+        else:
+            stack.pop()
+            order.append(bb)
+    order.reverse()
+    order.extend(sorted((bb for bb in cfg.blocks if bb not in visited), key=lambda b: b.id))
+    return order
+
+
+def reverse_post_order_indexed(succs: List[List[int]], roots: Iterable[int]) -> List[int]:
+    """
+    Node ids 0..n-1 in reverse post-order of a DFS from roots over succs.
+    Nodes not reached from any root are appended in id order.
+    """
+    n = len(succs)
+    visited = bytearray(n)
+    # Next successor position per node; the stack holds plain ints so a deep
+    # DFS does not allocate container objects for the GC to keep rescanning
+    pos = [0] * n
+    order = []
+    for root in roots:
+        if visited[root]:
+            continue
+        visited[root] = 1
+        stack = [root]
+        while stack:
+            node = stack[-1]
+            children = succs[node]
+            p = pos[node]
+            while p < len(children) and visited[children[p]]:
+                p += 1
+            if p < len(children):
+                child = children[p]
+                pos[node] = p + 1
+                visited[child] = 1
+                stack.append(child)
+            else:
+                pos[node] = p
+                stack.pop()
+                order.append(node)
+    order.reverse()
+    order.extend(i for i in range(n) if not visited[i])
+    return order
+
+
+def solve_indexed(order: List[int], sources: List[List[int]], dependents: List[List[int]], transfer: Callable,
+                  meet: Callable = operator.or_, top=0, start=None, boundary=None):
+    """
+    Worklist core over integer node ids 0..n-1.
+
+    order lists the node ids by priority; sources[i] are the nodes whose
+    outputs are met into i's input, dependents[i] the nodes to revisit when
+    i's output changes. Returns (before, after) lists indexed by node id.
+    """
+    n = len(sources)
+    rank = [0] * n
+    for r, node in enumerate(order):
+        rank[node] = r
+    before = [top] * n
+    after = [top] * n
+
+    # Every node starts queued; ranks 0..n-1 in order already form a valid heap
+    heap = list(range(len(order)))
+    queued = bytearray(b"\x01") * n
+    while heap:
+        i = order[heapq.heappop(heap)]
+        queued[i] = 0
+        value = top
+        for j in sources[i]:
+            value = meet(value, after[j])
+        if i == start and boundary is not None:
+            value = meet(value, boundary)
+        before[i] = value
+        new = transfer(i, value)
+        if new != after[i]:
+            after[i] = new
+            for j in dependents[i]:
+                if not queued[j]:
+                    queued[j] = 1
+                    heapq.heappush(heap, rank[j])
+
+    return before, after
+
+
+def solve(cfg, direction: str, transfer: Callable, meet: Callable = operator.or_, top=0, boundary=None):
+    """
+    Generic worklist solver over a ControlFlowGraph.
+
+    Blocks are prioritised by reverse post-order for FORWARD problems and by
+    post-order for BACKWARD ones, so acyclic regions settle in a single pass.
+    transfer(bb, value) maps the meet of the incoming values to the block's
+    outgoing value; boundary (if given) is met into the entry block's input
+    for FORWARD problems and the exit block's input for BACKWARD ones.
+
+    Returns (ins, outs) dicts keyed by block, in CFG terms.
+    """
+    blocks = reverse_post_order(cfg)
+    index = {bb: i for i, bb in enumerate(blocks)}
+
+    def ids(neighbours):
+        return [index[b] for b in neighbours if b in index]
+
+    preds = [ids(bb.predecessors) for bb in blocks]
+    succs = [ids(bb.successors) for bb in blocks]
+    order = list(range(len(blocks)))
+    if direction == FORWARD:
+        sources, dependents, start = preds, succs, index.get(cfg.entry)
+    else:
+        order.reverse()
+        sources, dependents, start = succs, preds, index.get(cfg.exit)
+
+    before, after = solve_indexed(order, sources, dependents, lambda i, value: transfer(blocks[i], value),
+                                  meet=meet, top=top, start=start, boundary=boundary)
+
+    before = {bb: before[i] for i, bb in enumerate(blocks)}
+    after = {bb: after[i] for i, bb in enumerate(blocks)}
+    if direction == FORWARD:
+        return before, after
+    return after, before
+
+
+class IncrementalSolution:
+    """
+    A solve() fixpoint that can be brought up to date after the CFG is edited.
+
+    After adding or removing blocks or edges, or changing a block's
+    statements, call update() with the blocks involved: new, removed and
+    edited blocks, and both ends of every added or removed edge. The worklist
+    is seeded with just those blocks (plus whatever their old facts may have
+    leaked into) and every other block keeps its previous value, so the cost
+    follows the size of the affected region rather than of the graph.
+
+    separable=True declares a bitmask problem whose bits flow independently
+    (gen/kill transfers with meet=or, like liveness and reaching definitions);
+    stale facts are then cleared bit by bit instead of resetting everything
+    downstream. forget(bb), if given, is called on each changed block so the
+    transfer function can drop anything it cached for it.
+    """
+
+    def __init__(self, cfg, direction: str, transfer: Callable, meet: Callable = operator.or_, top=0,
+                 boundary=None, separable: bool = False, forget: Optional[Callable] = None):
+        self.cfg = cfg
+        self.direction = direction
+        self.transfer = transfer
+        self.meet = meet
+        self.top = top
+        self.boundary = boundary
+        self.separable = separable
+        self.forget = forget
+
+        ins, outs = solve(cfg, direction, transfer, meet=meet, top=top, boundary=boundary)
+        # before/after in solving order: the input and output side of each block
+        self.before, self.after = (ins, outs) if direction == FORWARD else (outs, ins)
+
+        # Worklist priorities from the original (reverse) post-order; blocks
+        # added later are queued after them
+        order = reverse_post_order(cfg)
+        if direction == BACKWARD:
+            order.reverse()
+        self.priority = {bb: i for i, bb in enumerate(order)}
+        self.by_priority = dict(enumerate(order))
+
+    @property
+    def ins(self) -> Dict:
+        return self.before if self.direction == FORWARD else self.after
+
+    @property
+    def outs(self) -> Dict:
+        return self.after if self.direction == FORWARD else self.before
+
+    def _neighbours(self):
+        if self.direction == FORWARD:
+            return (lambda bb: bb.predecessors), (lambda bb: bb.successors), self.cfg.entry
+        return (lambda bb: bb.successors), (lambda bb: bb.predecessors), self.cfg.exit
+
+    def update(self, changed: Iterable, monotone: bool = False) -> int:
+        """
+        Re-solve after an edit; returns how many blocks were queued. Pass
+        monotone=True when the edit cannot remove facts, e.g. edges added to
+        a may-analysis or identity (empty) blocks spliced out, so nothing
+        needs clearing first.
+        """
+        blocks = self.cfg.blocks
+        before, after, top = self.before, self.after, self.top
+        sources_of, dependents_of, start = self._neighbours()
+
+        seeds = set()
+        for bb in changed:
+            if self.forget is not None:
+                self.forget(bb)
+            if bb not in blocks:
+                before.pop(bb, None)
+                after.pop(bb, None)
+                if bb in self.priority:
+                    del self.by_priority[self.priority.pop(bb)]
+                continue
+            if bb not in self.priority:
+                p = len(self.by_priority) and max(self.by_priority) + 1
+                self.priority[bb] = p
+                self.by_priority[p] = bb
+            seeds.add(bb)
+
+        if not monotone:
+            # Facts that held at a changed block may have reached its
+            # dependents only through the edit, so they are cleared there too
+            if self.separable:
+                cleared = {bb: before.get(bb, top) | after.get(bb, top) for bb in seeds}
+                for bb in seeds:
+                    before[bb] = after[bb] = top
+                stack = list(seeds)
+                while stack:
+                    bb = stack.pop()
+                    mask = cleared[bb]
+                    for dep in dependents_of(bb):
+                        if dep not in blocks:
+                            continue
+                        # Only bits still present can be stale; a bit missing
+                        # here cannot have flowed further along this path
+                        lost = mask & (before.get(dep, top) | after.get(dep, top)) & ~cleared.get(dep, 0)
+                        if lost:
+                            cleared[dep] = cleared.get(dep, 0) | lost
+                            before[dep] = before.get(dep, top) & ~lost
+                            after[dep] = after.get(dep, top) & ~lost
+                            stack.append(dep)
+                seeds.update(cleared)
+            else:
+                stack = list(seeds)
+                while stack:
+                    for dep in dependents_of(stack.pop()):
+                        if dep in blocks and dep not in seeds:
+                            seeds.add(dep)
+                            stack.append(dep)
+                for bb in seeds:
+                    before[bb] = after[bb] = top
+
+        priority, by_priority = self.priority, self.by_priority
+        meet, transfer, boundary = self.meet, self.transfer, self.boundary
+        heap = [priority[bb] for bb in seeds]
+        heapq.heapify(heap)
+        queued = set(seeds)
+        while heap:
+            bb = by_priority[heapq.heappop(heap)]
+            queued.discard(bb)
+            value = top
+            for src in sources_of(bb):
+                if src in blocks:
+                    value = meet(value, after.get(src, top))
+            if bb is start and boundary is not None:
+                value = meet(value, boundary)
+            before[bb] = value
+            new = transfer(bb, value)
+            if new != after.get(bb, top):
+                after[bb] = new
+                for dep in dependents_of(bb):
+                    if dep in blocks and dep not in queued:
+                        queued.add(dep)
+                        heapq.heappush(heap, priority[dep])
+        return len(seeds)
+
+
+def incremental_liveness(cfg) -> Tuple[Interner, IncrementalSolution]:
+    """Liveness as an IncrementalSolution; block masks are recomputed for changed blocks."""
+    variables = Interner()
+    masks: Dict = {}
+
+    def transfer(bb, out):
+        m = masks.get(bb)
+        if m is None:
+            m = masks[bb] = (variables.mask(sorted(bb.use_set)), variables.mask(sorted(bb.def_set)))
+        return m[0] | (out & ~m[1])
+
+    return variables, IncrementalSolution(cfg, BACKWARD, transfer, separable=True,
+                                          forget=lambda bb: masks.pop(bb, None))
+
+
+def liveness_masks(cfg) -> Tuple[Interner, Dict, Dict]:
+    """
+    Backward may-analysis: in = use | (out - def), out = union of successor ins.
+    Returns the variable interner and per-block live-in / live-out masks.
+    """
+    variables = Interner()
+    use = {bb: variables.mask(sorted(bb.use_set)) for bb in cfg.blocks}
+    defs = {bb: variables.mask(sorted(bb.def_set)) for bb in cfg.blocks}
+
+    live_in, live_out = solve(cfg, BACKWARD, lambda bb, out: use[bb] | (out & ~defs[bb]))
+    return variables, live_in, live_out
+
+
+def reaching_masks(cfg) -> Tuple[Interner, Dict, Dict, Dict, Dict]:
+    """
+    Forward may-analysis over (var, block_id) definitions:
+    in = union of predecessor outs, out = gen | (in - kill).
+    Returns the definition interner and per-block gen / kill / in / out masks.
+    """
+    definitions = Interner()
+    blocks = list(cfg.blocks)
+    defined_vars = {bb: {var for stmt in bb.statements for var in stmt.def_set} for bb in blocks}
+
+    # Index every variable to the mask of all its definition sites in one pass
+    gen = {}
+    sites: Dict[str, int] = {}
+    for bb in blocks:
+        g = 0
+        for var in sorted(defined_vars[bb]):
+            bit = 1 << definitions.intern((var, bb.id))
+            sites[var] = sites.get(var, 0) | bit
+            g |= bit
+        gen[bb] = g
+
+    # A block kills every other definition of the variables it defines
+    kill = {}
+    for bb in blocks:
+        k = 0
+        for var in defined_vars[bb]:
+            k |= sites[var]
+        kill[bb] = k & ~gen[bb]
+
+    rd_in, rd_out = solve(cfg, FORWARD, lambda bb, in_: gen[bb] | (in_ & ~kill[bb]))
+    return definitions, gen, kill, rd_in, rd_out
+
+
+def reachable(cfg) -> Set:
+    """Blocks reachable from cfg.entry, as a one-bit forward may-analysis."""
+    ins, _ = solve(cfg, FORWARD, lambda bb, in_: in_, boundary=1)
+    return {bb for bb, value in ins.items() if value}
@@ -2,13 +2,8 @@ import ast
 from typing import List, Set, Optional, Dict
 import sys
 
-# Global counter for BasicBlock IDs
-_basic_block_counter = -1
+from dataflow import liveness_masks, reaching_masks
 
-def _next_basic_block_id():
-    global _basic_block_counter
-    _basic_block_counter += 1
-    return f"BB{_basic_block_counter}"
 
 class StatementType:
     ASSIGNMENT = "assignment"
@@ -26,8 +21,10 @@ class Statement:
         self.ast_node: ast.AST = ast_node
 
 class BasicBlock:
-    def __init__(self):
-        self.id: str = _next_basic_block_id()
+    def __init__(self, number: int):
+        # number comes from the owning ControlFlowGraph's allocator
+        self.number: int = number
+        self.id: str = f"BB{number}"
         self.statements: List[Statement] = []
         self.def_set: Set[str] = set()
         self.use_set: Set[str] = set()
@@ -45,7 +42,7 @@ class BasicBlock:
         #     return f"Basic Block BB0: {self.id}\n\tPredecessors:\n\tSuccessors: {', '.join(succ.id for succ in self.successors)}"
         # if self.id == "Exit":
         #     return ""
-        #     return f"Basic Block {_next_basic_block_id()}: {self.id}"
+        #     return f"Basic Block BB{self.number}: {self.id}"
         
         block_lines = [f"Basic Block {self.id}:"]
         #block_lines.append(f"\tStatements:")
@@ -62,7 +59,7 @@ class BasicBlock:
             if block.id == "Entry":
                 return "BB0"
             elif block.id == "Exit":
-                return f"BB{_basic_block_counter}"
+                return f"BB{block.number}"
             else:
                 return block.id
 
@@ -106,7 +103,7 @@ class BasicBlock:
             if block.id == "Entry":
                 return "BB0"
             elif block.id == "Exit":
-                return f"BB{_basic_block_counter}"
+                return f"BB{block.number}"
             else:
                 return block.id
 
@@ -119,7 +116,7 @@ class BasicBlock:
         if self.id == "Entry":
             block_lines = [f"Basic Block BB0: {self.id}"]
         elif self.id == "Exit":
-            block_lines = [f"Basic Block BB{_basic_block_counter}: {self.id}"] 
+            block_lines = [f"Basic Block BB{self.number}: {self.id}"] 
         else:
             block_lines = [f"Basic Block {self.id}:"]
             block_lines.append(f"\tStatements:")
@@ -132,7 +129,7 @@ class BasicBlock:
             if block.id == "Entry":
                 return "BB0"
             elif block.id == "Exit":
-                return f"BB{_basic_block_counter}" 
+                return f"BB{block.number}" 
             else:
                 return block.id
 
@@ -142,13 +139,13 @@ class BasicBlock:
         return "\n".join(block_lines)
 
 class EntryBlock(BasicBlock):
-    def __init__(self):
-        super().__init__()
+    def __init__(self, number: int):
+        super().__init__(number)
         self.id = "Entry"
 
 class ExitBlock(BasicBlock):
-    def __init__(self):
-        super().__init__() 
+    def __init__(self, number: int):
+        super().__init__(number)
         self.id = "Exit"
 
 class ControlFlowGraph:
@@ -156,6 +153,12 @@ class ControlFlowGraph:
         self.blocks: Set[BasicBlock] = set()
         self.entry: EntryBlock = None
         self.exit: ExitBlock = None
+        # Block numbers are allocated per graph so construction is reentrant
+        self._block_counter: int = -1
+
+    def next_block_number(self) -> int:
+        self._block_counter += 1
+        return self._block_counter
 
     def add_block(self, block: BasicBlock):
         self.blocks.add(block)
@@ -183,18 +186,18 @@ class ControlFlowGraph:
             print(block)
 
     def cfg_printex2(self):
-        print(f"Basic Block BB0: {self.entry.id}\n\tPredecessors:\n\tSuccessors: {', '.join(succ.id for succ in self.entry.successors)}")
+        print(f"Basic Block BB0: {self.entry.id}\n\tPredecessors:\n\tSuccessors: {', '.join(sorted(succ.id for succ in self.entry.successors))}")
         for block in sorted(self.blocks, key=lambda b: b.id):
             if block.id not in ("Entry", "Exit"):
                 print(block.liveness_str())
-        print(f"Basic Block BB{_basic_block_counter}: {self.exit.id}\n\tPredecessors: {', '.join(pred.id for pred in self.exit.predecessors)}\n\tSuccessors:")
+        print(f"Basic Block BB{self.exit.number}: {self.exit.id}\n\tPredecessors: {', '.join(sorted(pred.id for pred in self.exit.predecessors))}\n\tSuccessors:")
 
     def cfg_printex3(self):
-        print(f"Basic Block BB0: {self.entry.id}\n\tPredecessors:\n\tSuccessors: {', '.join(succ.id for succ in self.entry.successors)}")
+        print(f"Basic Block BB0: {self.entry.id}\n\tPredecessors:\n\tSuccessors: {', '.join(sorted(succ.id for succ in self.entry.successors))}")
         for block in sorted(self.blocks, key=lambda b: b.id):
             if block.id not in ("Entry", "Exit"):
                 print(block.reaching_definitions_str())
-        print(f"Basic Block BB{_basic_block_counter}: {self.exit.id}\n\tPredecessors: {', '.join(pred.id for pred in self.exit.predecessors)}\n\tSuccessors:")
+        print(f"Basic Block BB{self.exit.number}: {self.exit.id}\n\tPredecessors: {', '.join(sorted(pred.id for pred in self.exit.predecessors))}\n\tSuccessors:")
 
 class Builder(ast.NodeVisitor):
     def __init__(self, cfg: ControlFlowGraph):
@@ -260,6 +263,41 @@ class Builder(ast.NodeVisitor):
         ))
 
     def visit_If(self, node):
+        # Reached through generic_visit (e.g. an if nested in a for); hand off
+        # to the explicit-stack builder
+        self.build([node])
+
+    def visit_While(self, node):
+        self.build([node])
+
+    def build(self, stmts):
+        """
+        Emit blocks for stmts straight into self.cfg without recursing into
+        nested bodies. Each stack frame is a pending statement list plus what to
+        do with the block it ends on once the list runs out.
+        """
+        stack = [(iter(stmts), None, None)]
+        while stack:
+            stmt_iter, kind, state = stack[-1]
+            stmt = next(stmt_iter, None)
+            if stmt is None:
+                stack.pop()
+                if kind is not None:
+                    self._close(kind, state, stack)
+            elif isinstance(stmt, ast.If):
+                stack.append(self._open_if(stmt))
+            elif isinstance(stmt, ast.While):
+                stack.append(self._open_while(stmt))
+            else:
+                self.visit(stmt)
+
+    def _new_block(self, pred: BasicBlock) -> BasicBlock:
+        block = BasicBlock(self.cfg.next_block_number())
+        self.cfg.add_block(block)
+        self.cfg.add_edge(pred, block)
+        return block
+
+    def _open_if(self, node):
         # Add IF condition into current block
         self.current_block.add_statement(Statement(
             stmt_type=StatementType.IF,
@@ -269,51 +307,11 @@ class Builder(ast.NodeVisitor):
         ))
 
         parent_block = self.current_block
+        self.current_block = self._new_block(parent_block)
+        return (iter(node.body), "then", (node, parent_block))
 
-        then_module = ast.Module(body=node.body, type_ignores=[])
-        then_cfg = make_cfg(then_module)
-        self.cfg.blocks.update(then_cfg.blocks)
-        self.cfg.add_edge(parent_block, then_cfg.entry)
-        then_exits = [b for b in then_cfg.blocks if len(b.successors) == 0]
-
-        if node.orelse:
-            else_module = ast.Module(body=node.orelse, type_ignores=[])
-            else_cfg = make_cfg(else_module)
-            self.cfg.blocks.update(else_cfg.blocks)
-            self.cfg.add_edge(parent_block, else_cfg.entry)
-            else_exits = [b for b in else_cfg.blocks if len(b.successors) == 0]
-        else:
-            else_exits = [parent_block]
-        
-        all_exits = then_exits + else_exits
-        merge_block = None    
-
-        for b in all_exits:
-            if b is not parent_block and not b.statements:
-                merge_block = b
-                break
-
-        if merge_block is None:
-            merge_block = BasicBlock()
-            self.cfg.add_block(merge_block)
-            
-            for b in all_exits:
-                self.cfg.add_edge(b, merge_block)
-        else:
-            all_other_exits = [b for b in all_exits if b is not merge_block]
-            
-            for b in all_other_exits:
-                self.cfg.add_edge(b, merge_block)
-
-        self.current_block = merge_block
-
-    def visit_While(self, node):
-        parent_block = self.current_block
-
-        cond_block = BasicBlock()
-        self.cfg.add_block(cond_block)
-        self.cfg.add_edge(parent_block, cond_block)
-
+    def _open_while(self, node):
+        cond_block = self._new_block(self.current_block)
         cond_block.add_statement(Statement(
             stmt_type=StatementType.WHILE,
             def_set=set(),
@@ -321,57 +319,62 @@ class Builder(ast.NodeVisitor):
             ast_node=node
         ))
 
-        body_module = ast.Module(body=node.body, type_ignores=[])
-        body_cfg = make_cfg(body_module)
-        self.cfg.blocks.update(body_cfg.blocks)
-        self.cfg.add_edge(cond_block, body_cfg.entry)
+        self.current_block = self._new_block(cond_block)
+        return (iter(node.body), "body", (node, cond_block))
 
-        body_exits = [b for b in body_cfg.blocks if len(b.successors) == 0]
-        for b in body_exits:
-            self.cfg.add_edge(b, cond_block)
-
-        if node.orelse:
-            else_module = ast.Module(body=node.orelse, type_ignores=[])
-            else_cfg = make_cfg(else_module)
-            self.cfg.blocks.update(else_cfg.blocks)
-            
-            self.cfg.add_edge(cond_block, else_cfg.entry)
-            else_exits = [b for b in else_cfg.blocks if len(b.successors) == 0]
-            fallthrough_exits = else_exits
-        else:
-            fallthrough_exits = [cond_block]
+    def _close(self, kind, state, stack):
+        if kind == "then":
+            node, parent_block = state
+            then_exit = self.current_block
+            if node.orelse:
+                self.current_block = self._new_block(parent_block)
+                stack.append((iter(node.orelse), "else", (parent_block, then_exit)))
+            else:
+                self._merge([then_exit, parent_block], parent_block)
+        elif kind == "else":
+            parent_block, then_exit = state
+            self._merge([then_exit, self.current_block], parent_block)
+        elif kind == "body":
+            node, cond_block = state
+            # loop back from the end of the body
+            self.cfg.add_edge(self.current_block, cond_block)
+            if node.orelse:
+                self.current_block = self._new_block(cond_block)
+                stack.append((iter(node.orelse), "loop_else", cond_block))
+            else:
+                self._merge([cond_block], cond_block)
+        elif kind == "loop_else":
+            self._merge([self.current_block], state)
 
-        
+    def _merge(self, exits, branch_block):
+        # Reuse an empty exit as the merge point, otherwise join into a new block
         merge_block = None
-        
-        for b in fallthrough_exits:
-            if b is not cond_block and not b.statements:
+        for b in exits:
+            if b is not branch_block and not b.statements:
                 merge_block = b
                 break
-        
+
         if merge_block is None:
-            merge_block = BasicBlock()
+            merge_block = BasicBlock(self.cfg.next_block_number())
             self.cfg.add_block(merge_block)
 
-            for b in fallthrough_exits:
-                self.cfg.add_edge(b, merge_block)
-        else:
-            all_other_exits = [b for b in fallthrough_exits if b is not merge_block]
-            
-            for b in all_other_exits:
+        for b in exits:
+            if b is not merge_block:
                 self.cfg.add_edge(b, merge_block)
 
         self.current_block = merge_block
 
 
-def make_cfg(ast_node: ast.AST) -> ControlFlowGraph:
+def make_cfg(ast_node: ast.AST, cfg: Optional[ControlFlowGraph] = None) -> ControlFlowGraph:
     """
     Constructs a Control Flow Graph (CFG) from the given AST node (tree or subtree).
+    Blocks are added to (and numbered by) cfg if given, otherwise a new graph.
     Returns a ControlFlowGraph instance representing the CFG.
     """
-    cfg = ControlFlowGraph()
+    if cfg is None:
+        cfg = ControlFlowGraph()
     # entry block
-    cfg.entry = BasicBlock()
+    cfg.entry = BasicBlock(cfg.next_block_number())
     cfg.add_block(cfg.entry)
 
     builder = Builder(cfg)
@@ -382,8 +385,7 @@ def make_cfg(ast_node: ast.AST) -> ControlFlowGraph:
     else:
         stmts = []
 
-    for stmt in stmts:
-        builder.visit(stmt)
+    builder.build(stmts)
 
     # The CFG's "exit" is whatever builder.current_block ended up being.
     cfg.exit = builder.current_block
@@ -394,14 +396,15 @@ def make_cfg_manager(ast_node: ast.AST) -> ControlFlowGraph:
     Constructs a Control Flow Graph (CFG) using a manager from the given AST node (tree or subtree).
     Returns a ControlFlowGraph instance representing the CFG.
     """
-    entry = EntryBlock()
+    cfg = ControlFlowGraph()
+    entry = EntryBlock(cfg.next_block_number())
     
-    cfg = make_cfg(ast_node)
+    make_cfg(ast_node, cfg)
     
     inner_exit_block = cfg.exit
     
     if not inner_exit_block.statements:
-        final_exit = ExitBlock()
+        final_exit = ExitBlock(cfg.next_block_number())
         
         for pred_block in list(inner_exit_block.predecessors):
             if inner_exit_block in pred_block.successors:
@@ -413,7 +416,7 @@ def make_cfg_manager(ast_node: ast.AST) -> ControlFlowGraph:
             cfg.blocks.remove(inner_exit_block)
             
     else:
-        final_exit = ExitBlock()
+        final_exit = ExitBlock(cfg.next_block_number())
         
         cfg.add_edge(inner_exit_block, final_exit)
 
@@ -427,86 +430,20 @@ def make_cfg_manager(ast_node: ast.AST) -> ControlFlowGraph:
     return cfg
 
 def make_queue(cfg: ControlFlowGraph):
-    #create in and out set for each bb
+    # solve liveness on bitmasks, then expose the results as in/out sets
+    variables, live_in, live_out = liveness_masks(cfg)
     for bb in cfg.blocks:
-        bb.in_set = set()
-        bb.out_set = set()
-
-    #create a queue to add all bbs to
-    bb_queue = []
-    bb_queue.append(cfg.entry)
-
-    for bb in cfg.blocks:
-        bb_queue.append(bb)
-
-    bb_queue.append(cfg.exit)
-
-    ##update in and out sets
-    while bb_queue:
-        #Pull a node from the head of the queue
-        bb = bb_queue.pop(0)
-
-        old_in = bb.in_set.copy()
-        old_out = bb.out_set.copy()
-
-        #update in and out sets
-
-        if bb.successors:
-            new_out = set()
-            for successor in bb.successors:
-                new_out = new_out | successor.in_set
-            bb.out_set= new_out
-
-        bb.in_set = bb.use_set | (bb.out_set - bb.def_set)
-
-        if bb.in_set != old_in:
-            for predecessor in bb.predecessors:
-                if predecessor not in bb_queue:
-                    bb_queue.append(predecessor)
+        bb.in_set = variables.decode(live_in[bb])
+        bb.out_set = variables.decode(live_out[bb])
 
 def reaching_definition(cfg: ControlFlowGraph):
-    #create in and out set for each bb
+    # solve reaching definitions on bitmasks, then expose gen/kill/in/out sets
+    definitions, gen, kill, rd_in, rd_out = reaching_masks(cfg)
     for bb in cfg.blocks:
-        #initialize in, out, gen, kill sets
-        bb.in_rd = set()
-        bb.out_rd = set()
-        bb.gen_set = set()
-        bb.kill_set = set()
-        temp = set()
-
-    # compute gen and kill sets
-        for stmt in bb.statements:
-            for var in stmt.def_set:
-                bb.gen_set.add((var, bb.id))
-                temp.add(var)
-        
-        for other_bb in cfg.blocks:
-            if other_bb is not bb:
-                for stmt in other_bb.statements:
-                    for var in stmt.def_set:
-                        if var in temp:
-                            bb.kill_set.add((var, other_bb.id))
-
-    # iterative computation of in and out sets
-    changed = True
-    while changed:
-        changed = False
-        for bb in cfg.blocks:
-            old_in = bb.in_rd.copy()
-            old_out = bb.out_rd.copy()
-
-            # update in set
-            new_in = set()
-            for pred in bb.predecessors:
-                new_in = new_in | pred.out_rd
-            bb.in_rd = new_in
-
-            # update out set
-            bb.out_rd = bb.gen_set | (bb.in_rd - bb.kill_set)
-
-            # check if changed
-            if bb.in_rd != old_in or bb.out_rd != old_out:
-                changed = True
+        bb.gen_set = definitions.decode(gen[bb])
+        bb.kill_set = definitions.decode(kill[bb])
+        bb.in_rd = definitions.decode(rd_in[bb])
+        bb.out_rd = definitions.decode(rd_out[bb])
 
 def get_uses(node):
     if node is None:
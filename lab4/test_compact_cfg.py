@@ -0,0 +1,33 @@
+import ast
+import contextlib
+import io
+
+import cfgbugs_template as c
+
+SOURCE = """
+def f(x):
+    y = 1
+    z = x
+    if x > 0:
+        y = 2
+        return y
+    while z:
+        z = z - 1
+    w = z
+"""
+
+
+def run(name, session):
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        c.CHECKERS[name]("<test>", session)
+    return out.getvalue()
+
+
+def test_compact_checkers_match_object_checkers():
+    session = c.AnalysisSession("<test>", tree=ast.parse(SOURCE))
+    assert run("stores", session) == ("BB1: variable y definition is never used\n"
+                                      "BB5: variable w definition is never used\n")
+    assert run("returns", session) == "BB5: there exists a path to exit without return\n"
+    for name in ("stores", "returns"):
+        assert run(name + "-compact", session) == run(name, session)
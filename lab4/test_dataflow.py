@@ -0,0 +1,112 @@
+import ast
+import os
+import random
+
+import pytest
+
+from bench_update import nested_source
+from cfgbugs_template import Statement, StatementType, make_cfg, make_cfg_manager
+from dataflow import BACKWARD, IncrementalSolution, Interner, incremental_liveness, liveness_masks, reaching_masks
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def sample_cfgs():
+    with open(os.path.join(HERE, "test.py")) as f:
+        tree = ast.parse(f.read())
+    return [make_cfg_manager(tree), make_cfg(ast.parse(nested_source(120, n_vars=12)))]
+
+
+def fixpoint(cfg, sources, transfer):
+    # Round-robin over plain sets until nothing changes
+    ins = {bb: set() for bb in cfg.blocks}
+    outs = {bb: set() for bb in cfg.blocks}
+    changed = True
+    while changed:
+        changed = False
+        for bb in cfg.blocks:
+            ins[bb] = set().union(*(outs[s] for s in sources(bb) if s in cfg.blocks))
+            new = transfer(bb, ins[bb])
+            if new != outs[bb]:
+                outs[bb] = new
+                changed = True
+    return ins, outs
+
+
+def set_liveness(cfg):
+    live_out, live_in = fixpoint(cfg, lambda bb: bb.successors, lambda bb, out: bb.use_set | (out - bb.def_set))
+    return live_in, live_out
+
+
+def set_reaching(cfg):
+    defined = {bb: {var for stmt in bb.statements for var in stmt.def_set} for bb in cfg.blocks}
+    gen = {bb: {(var, bb.id) for var in defined[bb]} for bb in cfg.blocks}
+    every = set().union(*gen.values())
+    kill = {bb: {d for d in every if d[0] in defined[bb]} - gen[bb] for bb in cfg.blocks}
+    rd_in, rd_out = fixpoint(cfg, lambda bb: bb.predecessors, lambda bb, in_: gen[bb] | (in_ - kill[bb]))
+    return gen, kill, rd_in, rd_out
+
+
+def decoded(interner, masks):
+    return {bb: interner.decode(m) for bb, m in masks.items()}
+
+
+@pytest.mark.parametrize("cfg", sample_cfgs())
+def test_liveness_masks_match_sets(cfg):
+    variables, live_in, live_out = liveness_masks(cfg)
+    assert (decoded(variables, live_in), decoded(variables, live_out)) == set_liveness(cfg)
+
+
+@pytest.mark.parametrize("cfg", sample_cfgs())
+def test_reaching_masks_match_sets(cfg):
+    definitions, gen, kill, rd_in, rd_out = reaching_masks(cfg)
+    got = tuple(decoded(definitions, m) for m in (gen, kill, rd_in, rd_out))
+    assert got == set_reaching(cfg)
+
+
+def plain_liveness(cfg):
+    # incremental_liveness without the separable clearing
+    variables = Interner()
+    masks = {}
+
+    def transfer(bb, out):
+        m = masks.get(bb)
+        if m is None:
+            m = masks[bb] = (variables.mask(sorted(bb.use_set)), variables.mask(sorted(bb.def_set)))
+        return m[0] | (out & ~m[1])
+
+    return variables, IncrementalSolution(cfg, BACKWARD, transfer, forget=lambda bb: masks.pop(bb, None))
+
+
+def rewrite(bb, rng, names):
+    # Replace the block's statements with random assignments
+    bb.statements = []
+    bb.def_set, bb.use_set = set(), set()
+    for _ in range(rng.randrange(3)):
+        bb.add_statement(Statement(StatementType.ASSIGNMENT, {rng.choice(names)},
+                                   set(rng.sample(names, rng.randrange(3))), None))
+
+
+@pytest.mark.parametrize("make", [incremental_liveness, plain_liveness])
+def test_incremental_updates_match_a_full_solve(make):
+    rng = random.Random(0)
+    names = [f"v{i}" for i in range(12)] + ["w"]
+    cfg = make_cfg(ast.parse(nested_source(60, n_vars=12)))
+    variables, solution = make(cfg)
+    blocks = sorted(cfg.blocks, key=lambda b: b.number)
+    for _ in range(300):
+        a, b = rng.choice(blocks), rng.choice(blocks)
+        edit = rng.random()
+        if edit < 0.3 and a.id not in ("Entry", "Exit"):
+            rewrite(a, rng, names)
+            solution.update([a])
+        elif b in a.successors:
+            a.successors.discard(b)
+            b.predecessors.discard(a)
+            solution.update([a, b])
+        else:
+            cfg.add_edge(a, b)
+            solution.update([a, b], monotone=True)
+        expected_in, expected_out = set_liveness(cfg)
+        assert decoded(variables, solution.ins) == expected_in
+        assert decoded(variables, solution.outs) == expected_out
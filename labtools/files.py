@@ -0,0 +1,16 @@
+import glob
+import os
+from typing import List
+
+
+def collect_files(patterns) -> List[str]:
+    # Expand directories and globs into a sorted, de-duplicated list of .py files
+    files = set()
+    for pattern in patterns:
+        for path in glob.glob(pattern, recursive=True) or [pattern]:
+            if os.path.isdir(path):
+                for root, _, names in os.walk(path):
+                    files.update(os.path.join(root, n) for n in names if n.endswith(".py"))
+            else:
+                files.add(path)
+    return sorted(files)
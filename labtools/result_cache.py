@@ -0,0 +1,119 @@
+"""
+On-disk cache of checker output, keyed by tool version, checker name and the
+SHA-256 of the analysed file's content. Unchanged files are answered from the
+cache without being parsed.
+"""
+import hashlib
+import os
+import sys
+from typing import Optional
+
+
+def source_version(*paths) -> str:
+    # Hash the tool's own sources so any code change invalidates old entries
+    h = hashlib.sha256()
+    for path in paths:
+        with open(path, "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()[:16]
+
+
+class ResultCache:
+    """
+    One file per entry under directory/<key[:2]>/<key>. Each hit refreshes the
+    entry's mtime; once the cache grows past max_bytes the least recently used
+    entries are evicted down to 90% of the limit.
+    """
+
+    def __init__(self, directory: str, version: str, max_bytes: int = 64 * 1024 * 1024):
+        self.directory = directory
+        self.version = version
+        self.max_bytes = max_bytes
+        self.size: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        os.makedirs(directory, exist_ok=True)
+
+    @classmethod
+    def from_env(cls, version: str) -> Optional["ResultCache"]:
+        # ANALYSIS_CACHE=<dir> enables the cache, ANALYSIS_CACHE_MAX_MB bounds it
+        directory = os.environ.get("ANALYSIS_CACHE")
+        if not directory:
+            return None
+        max_mb = float(os.environ.get("ANALYSIS_CACHE_MAX_MB", "64"))
+        return cls(directory, version, int(max_mb * 1024 * 1024))
+
+    def key(self, content: bytes, checker: str) -> str:
+        h = hashlib.sha256()
+        h.update(self.version.encode())
+        h.update(b"\0")
+        h.update(checker.encode())
+        h.update(b"\0")
+        h.update(content)
+        return h.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key)
+
+    def get(self, key: str, source_size: int = 0) -> Optional[str]:
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                output = f.read()
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        os.utime(path)
+        self.hits += 1
+        self.bytes_saved += source_size
+        return output
+
+    def put(self, key: str, output: str):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename so concurrent runs never see a partial entry
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(output)
+        try:
+            replaced = os.path.getsize(path)
+        except FileNotFoundError:
+            replaced = 0
+        os.replace(tmp, path)
+
+        if self.size is None:
+            self.size = sum(size for _, size, _ in self._entries())
+        else:
+            # Overwriting a key swaps one entry for another
+            self.size += os.path.getsize(path) - replaced
+        if self.size > self.max_bytes:
+            self._evict()
+
+    def _entries(self):
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if name.endswith(".tmp"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield st.st_mtime, st.st_size, path
+
+    def _evict(self):
+        entries = sorted(self._entries())
+        self.size = sum(size for _, size, _ in entries)
+        target = int(self.max_bytes * 0.9)
+        for _, size, path in entries:
+            if self.size <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self.size -= size
+
+    def report(self, stream=sys.stderr):
+        print(f"cache: {self.hits} hits, {self.misses} misses, {self.bytes_saved} bytes saved", file=stream)
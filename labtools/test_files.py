@@ -0,0 +1,13 @@
+import os
+
+from labtools.files import collect_files
+
+
+def test_collect_files(tmp_path):
+    (tmp_path / "pkg").mkdir()
+    for name in ("a.py", "b.txt", "pkg/c.py"):
+        (tmp_path / name).write_text("")
+    a, c = str(tmp_path / "a.py"), os.path.join(str(tmp_path), "pkg", "c.py")
+    assert collect_files([str(tmp_path)]) == [a, c]
+    # Globs and repeated paths are expanded once; unmatched names are kept
+    assert collect_files([str(tmp_path / "*.py"), a, "missing.py"]) == sorted([a, "missing.py"])
@@ -0,0 +1,40 @@
+import os
+
+from labtools.result_cache import ResultCache
+
+
+def on_disk(directory):
+    return sum(os.path.getsize(os.path.join(root, name))
+               for root, _, names in os.walk(directory) for name in names)
+
+
+def test_get_returns_put(tmp_path):
+    cache = ResultCache(str(tmp_path), "v1")
+    key = cache.key(b"x = 1\n", "stores")
+    assert cache.get(key) is None
+    cache.put(key, "out\n")
+    assert cache.get(key) == "out\n"
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert cache.key(b"x = 1\n", "returns") != key
+
+
+def test_overwrite_replaces_size(tmp_path):
+    cache = ResultCache(str(tmp_path), "v1")
+    key = cache.key(b"x = 1\n", "stores")
+    cache.put(cache.key(b"y = 2\n", "stores"), "a" * 100)
+    cache.put(key, "b" * 300)
+    cache.put(key, "c" * 50)
+    assert cache.size == on_disk(tmp_path) == 150
+    assert cache.get(key) == "c" * 50
+
+
+def test_overwrites_do_not_evict(tmp_path):
+    cache = ResultCache(str(tmp_path), "v1", max_bytes=1000)
+    keep = cache.key(b"x = 1\n", "stores")
+    cache.put(keep, "k" * 100)
+    key = cache.key(b"y = 2\n", "stores")
+    for _ in range(20):
+        cache.put(key, "v" * 400)
+    # 500 bytes on disk; counting every write as new would have evicted keep
+    assert cache.size == 500
+    assert cache.get(keep) == "k" * 100